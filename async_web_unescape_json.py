@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+"""Web版本的生产部署模式
+
+请求I/O跑在 asyncio 事件循环上，转义计算交给有上限的进程池：
+排队的任务太多时直接返回503，每个请求有处理时限，小请求直接在事件循环里算，
+不会排在大请求后面。大请求的JSON解析、缓存键计算和响应序列化也在进程池中执行。
+不支持 text/plain 原始文本流式模式（返回415），需要时使用 Flask 版本。
+需要额外安装 aiohttp（pip install aiohttp）。
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from aiohttp import web
+except ImportError:
+    web = None
+
+from web_unescape_json import (COMPRESSIBLE_MIMETYPES, app as flask_app, cache_key, compress_body, index_page,
+                               budget_limits, metrics, negotiate_encoding, parse_options, record_outcome,
+                               result_cache, run_unescape_safe)
+
+
+class ServerBusy(Exception):
+    """进程池排队已满"""
+
+
+class WorkerPool:
+    """有上限的进程池
+
+    在途任务达到 max_pending 时抛出 ServerBusy，超过 timeout 秒抛出 asyncio.TimeoutError；
+    输入不超过 inline_bytes 的小任务直接在当前线程执行。
+    """
+
+    def __init__(self, workers, max_pending, timeout, inline_bytes):
+        self.executor = ProcessPoolExecutor(max_workers=workers)
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.inline_bytes = inline_bytes
+        self.pending = 0
+        self.manager = None
+
+    def cancel_event(self, size):
+        """run(size, ...) 的任务用的取消标志
+
+        在当前线程执行时为 threading.Event；交给子进程时为 Manager().Event()，
+        主进程置位后子进程里的预算也能看到（第一次用到时才启动 Manager 进程）。
+        """
+        if size <= self.inline_bytes:
+            return threading.Event()
+        if self.manager is None:
+            self.manager = multiprocessing.Manager()
+        return self.manager.Event()
+
+    async def run(self, size, fn, *args):
+        if size <= self.inline_bytes:
+            return fn(*args)
+        if self.pending >= self.max_pending:
+            raise ServerBusy()
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await asyncio.wait_for(loop.run_in_executor(self.executor, fn, *args), self.timeout)
+        finally:
+            self.pending -= 1
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        if self.manager is not None:
+            self.manager.shutdown()
+
+
+def run_batch(options_list, limits):
+    """在子进程中处理一批条目，每条开始处理时按 limits 单独创建预算"""
+    return [run_unescape_safe(options, limits) for options in options_list]
+
+
+# 以下几个函数在子进程中执行：json 的解析和序列化不释放GIL，放到线程里照样阻塞事件循环
+
+def parse_body(body, use_cache):
+    """解析 /unescape 的请求体，返回 (options, 缓存键)，不用缓存时键为None"""
+    options = parse_options(json.loads(body))
+    return options, cache_key(options) if use_cache else None
+
+
+def parse_batch_body(body, max_items, use_cache):
+    """解析 /unescape/batch 的请求体，每条返回 (options, 缓存键) 或 (None, 错误信息)"""
+    items = json.loads(body).get('items')
+    if not isinstance(items, list):
+        raise ValueError('items 必须是数组')
+    if len(items) > max_items:
+        raise ValueError(f'单次最多 {max_items} 条')
+    parsed = []
+    for item in items:
+        try:
+            options = parse_options(item)
+        except Exception as e:
+            parsed.append((None, str(e)))
+            continue
+        parsed.append((options, cache_key(options) if use_cache else None))
+    return parsed
+
+
+def dump_json(payload):
+    """序列化JSON响应体"""
+    return json.dumps(payload).encode('utf-8')
+
+
+def _error(message, status=200):
+    return web.json_response({'success': False, 'error': message}, status=status)
+
+
+async def _run_in_pool(request, size, fn, *args):
+    """提交到进程池，把排队已满和超时转换成对应的HTTP错误"""
+    pool = request.app['pool']
+    try:
+        return await pool.run(size, fn, *args), None
+    except ServerBusy:
+        return None, _error('服务器繁忙，请稍后重试', status=503)
+    except asyncio.TimeoutError:
+        return None, _error(f'处理超时（{pool.timeout}秒）', status=504)
+
+
+async def _json_response(request, payload, size, status=200):
+    """返回JSON响应，size 为结果文本的大小，大响应在进程池中序列化"""
+    body, error = await _run_in_pool(request, size, dump_json, payload)
+    if error is not None:
+        return error
+    return web.Response(body=body, status=status, content_type='application/json')
+
+
+async def index(request):
+    """主页，和 Flask 版本共用构建好的页面、ETag 和压缩版"""
+    status, body, headers = index_page.respond(request.headers.get('If-None-Match'),
+                                               request.headers.get('Accept-Encoding'),
+                                               flask_app.config['STATIC_MAX_AGE'])
+    return web.Response(body=body, status=status, headers=headers)
+
+
+async def unescape(request):
+    """处理转义请求"""
+    if request.content_type == 'text/plain':
+        return _error('生产部署模式不支持 text/plain 流式请求，请使用 Flask 版本或JSON请求', status=415)
+    body = await request.read()
+    use_cache = flask_app.config['RESULT_CACHE_ENABLED']
+    try:
+        parsed, error = await _run_in_pool(request, len(body), parse_body, body, use_cache)
+    except Exception as e:
+        return _error(str(e))
+    if error is not None:
+        return error
+    options, key = parsed
+
+    if use_cache:
+        result = result_cache.get(key)
+        if result is not None:
+            return await _json_response(request, {'success': True, 'result': result}, len(result))
+
+    # 子进程按同样的时限自行停下，超时后不会继续占着进程
+    limits = budget_limits(request.app['pool'].timeout)
+    outcome, error = await _run_in_pool(request, len(options[0]), run_unescape_safe, options, limits)
+    if error is not None:
+        return error
+    ok, value, trace = outcome
+    record_outcome(options, ok, value, trace)
+    if not ok:
+        status = 200
+        if 'diagnostics' in value:
+            status = 413 if value['diagnostics']['limit'] == 'input_bytes' else 422
+        return web.json_response({'success': False, **value}, status=status)
+    if use_cache:
+        result_cache.put(key, value)
+    return await _json_response(request, {'success': True, 'result': value}, len(value))
+
+
+async def unescape_batch(request):
+    """批量处理转义请求，整批作为一个任务提交到进程池"""
+    body = await request.read()
+    use_cache = flask_app.config['RESULT_CACHE_ENABLED']
+    try:
+        parsed, error = await _run_in_pool(request, len(body), parse_batch_body, body,
+                                           flask_app.config['BATCH_MAX_ITEMS'], use_cache)
+    except Exception as e:
+        return _error(str(e))
+    if error is not None:
+        return error
+
+    results = [None] * len(parsed)
+    pending = []
+    for i, (options, key) in enumerate(parsed):
+        if options is None:
+            # 解析失败时第二项是错误信息
+            results[i] = {'success': False, 'error': key}
+            continue
+        result = result_cache.get(key) if use_cache else None
+        if result is not None:
+            results[i] = {'success': True, 'result': result}
+        else:
+            pending.append((i, key, options))
+
+    if pending:
+        size = sum(len(options[0]) for _, _, options in pending)
+        outcomes, error = await _run_in_pool(request, size, run_batch, [options for _, _, options in pending],
+                                             budget_limits(request.app['pool'].timeout))
+        if error is not None:
+            return error
+        for (i, key, options), (ok, value, trace) in zip(pending, outcomes):
+            record_outcome(options, ok, value, trace)
+            if ok:
+                if use_cache:
+                    result_cache.put(key, value)
+                results[i] = {'success': True, 'result': value}
+            else:
+                results[i] = {'success': False, **value}
+
+    size = sum(len(item['result']) for item in results if item['success'])
+    return await _json_response(request, {'success': True, 'results': results}, size)
+
+
+async def cache_stats(request):
+    """结果缓存的命中统计"""
+    stats = result_cache.stats()
+    stats['enabled'] = flask_app.config['RESULT_CACHE_ENABLED']
+    return web.json_response(stats)
+
+
+async def _preview_job(request, ws, job_id, options, cancel, previous=None):
+    """计算一次实时预览，期间有了更新的输入（cancel 置位）就不再发送结果
+
+    和 /unescape 一样交给进程池、受同样的排队上限，取消时子进程在下一轮unescape开始前停下。
+    previous 为同一连接上一个（已取消的）任务，等它退出后再提交，每个连接最多占用一个位置。
+    """
+    use_cache = flask_app.config['RESULT_CACHE_ENABLED']
+    key = cache_key(options) if use_cache else None
+    result = result_cache.get(key) if use_cache else None
+    if result is not None:
+        await ws.send_json({'id': job_id, 'success': True, 'result': result})
+        return
+    if previous is not None:
+        await asyncio.wait([previous])
+        if cancel.is_set():
+            return
+    pool = request.app['pool']
+    try:
+        outcome = await pool.run(len(options[0]), run_unescape_safe, options, budget_limits(pool.timeout), cancel)
+    except ServerBusy:
+        outcome = False, {'error': '服务器繁忙，请稍后重试'}, None
+    except asyncio.TimeoutError:
+        outcome = False, {'error': f'处理超时（{pool.timeout}秒）'}, None
+    ok, value, trace = outcome
+    if trace is not None:
+        record_outcome(options, ok, value, trace)
+    if cancel.is_set() or ws.closed:
+        return
+    if ok:
+        if use_cache:
+            result_cache.put(key, value)
+        await ws.send_json({'id': job_id, 'success': True, 'result': value})
+    else:
+        await ws.send_json({'id': job_id, 'success': False, **value})
+
+
+async def preview(request):
+    """实时预览的 WebSocket 通道
+
+    客户端每次发送 {"id": ..., "text": ..., 其它参数同 /unescape}，新输入会取消上一个
+    还没完成的任务，只返回最新输入的结果 {"id": ..., "success": ..., "result"/"error": ...}。
+    """
+    ws = web.WebSocketResponse(heartbeat=30, max_msg_size=request.app['max_preview_bytes'])
+    await ws.prepare(request)
+    task, cancel = None, None
+    try:
+        async for msg in ws:
+            if msg.type != web.WSMsgType.TEXT:
+                continue
+            if task is not None and not task.done():
+                cancel.set()
+            job_id = None
+            try:
+                data = json.loads(msg.data)
+                job_id = data.get('id')
+                options = parse_options(data)
+            except Exception as e:
+                await ws.send_json({'id': job_id, 'success': False, 'error': str(e)})
+                continue
+            cancel = request.app['pool'].cancel_event(len(options[0]))
+            task = asyncio.create_task(_preview_job(request, ws, job_id, options, cancel, task))
+    finally:
+        if task is not None and not task.done():
+            cancel.set()
+    return ws
+
+
+async def metrics_endpoint(request):
+    """Prometheus 格式的请求、各阶段耗时和缓存指标"""
+    cache = result_cache.stats() if flask_app.config['RESULT_CACHE_ENABLED'] else None
+    return web.Response(text=metrics.render(cache), content_type='text/plain', charset='utf-8')
+
+
+if web is not None:
+    @web.middleware
+    async def record_request(request, handler):
+        """记录每个请求的耗时和状态码"""
+        start = time.perf_counter()
+        status = 500
+        try:
+            response = await handler(request)
+            status = response.status
+            return response
+        except web.HTTPException as e:
+            status = e.status
+            raise
+        finally:
+            route = request.match_info.route
+            endpoint = route.handler.__name__ if route.resource is not None else 'unknown'
+            metrics.observe('unescape_request_seconds', time.perf_counter() - start, endpoint=endpoint)
+            metrics.inc('unescape_requests_total', endpoint=endpoint, status=str(status))
+
+    @web.middleware
+    async def compress_response(request, handler):
+        """按 Flask 版本同样的配置压缩较大的接口响应"""
+        response = await handler(request)
+        config = flask_app.config
+        if (not config['COMPRESS_ENABLED'] or not isinstance(response, web.Response) or response.body is None
+                or 'Content-Encoding' in response.headers or 'ETag' in response.headers
+                or response.content_type not in COMPRESSIBLE_MIMETYPES):
+            return response
+        response.headers.add('Vary', 'Accept-Encoding')
+        encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+        body = response.body
+        if encoding is None or len(body) < config['COMPRESS_MIN_BYTES']:
+            return response
+        # 大响应在线程中压缩，不阻塞事件循环
+        response.body = await asyncio.to_thread(compress_body, body, encoding, config['COMPRESS_LEVEL'])
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+
+def create_app(workers, max_pending, timeout, inline_bytes, max_body_bytes, max_preview_bytes=8 * 1024 * 1024):
+    """创建 aiohttp 应用"""
+    app = web.Application(client_max_size=max_body_bytes, middlewares=[record_request, compress_response])
+    app['pool'] = WorkerPool(workers, max_pending, timeout, inline_bytes)
+    app['max_preview_bytes'] = max_preview_bytes
+    app.router.add_get('/', index)
+    app.router.add_post('/unescape', unescape)
+    app.router.add_post('/unescape/batch', unescape_batch)
+    app.router.add_get('/cache/stats', cache_stats)
+    app.router.add_get('/metrics', metrics_endpoint)
+    app.router.add_get('/ws/preview', preview)
+
+    async def shutdown_pool(app):
+        app['pool'].shutdown()
+
+    app.on_cleanup.append(shutdown_pool)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description='JSON转义工具 Web 生产部署模式（aiohttp + 进程池）')
+    parser.add_argument('--host', default='0.0.0.0', help='监听地址（默认 %(default)s）')
+    parser.add_argument('--port', type=int, default=8080, help='监听端口（默认 %(default)s）')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='进程池大小（默认CPU核数 %(default)s）')
+    parser.add_argument('--max-queue', type=int, default=64,
+                        help='进程池中排队和执行中的任务上限，超过返回503（默认 %(default)s）')
+    parser.add_argument('--timeout', type=float, default=30,
+                        help='每个请求的处理时限（秒），超时返回504（默认 %(default)s）')
+    parser.add_argument('--inline-bytes', type=int, default=16 * 1024,
+                        help='不超过这个大小的输入直接在事件循环中处理（默认 %(default)s）')
+    parser.add_argument('--max-body', type=int, default=256 * 1024 * 1024,
+                        help='请求体大小上限，字节（默认 %(default)s）')
+    parser.add_argument('--max-preview', type=int, default=8 * 1024 * 1024,
+                        help='实时预览每条 WebSocket 消息的大小上限，字节（默认 %(default)s）')
+    args = parser.parse_args()
+
+    if web is None:
+        print("生产部署模式需要 aiohttp，请先执行: pip install aiohttp", file=sys.stderr)
+        sys.exit(1)
+
+    app = create_app(args.workers, args.max_queue, args.timeout, args.inline_bytes, args.max_body, args.max_preview)
+    web.run_app(app, host=args.host, port=args.port)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,5 @@
+"""JSON转义工具的基准测试
+
+python -m bench run 运行基准并写出JSON结果，python -m bench compare 和基线对比，
+python -m bench memory 检查整体处理的内存峰值，python -m bench corpus 只生成测试语料。
+"""
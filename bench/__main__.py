@@ -0,0 +1,126 @@
+"""python -m bench run|compare|memory|corpus"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+
+from bench.corpus import DENSITIES, SIZES, write_corpus
+from bench.runners import SUITES, check_memory
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+DEFAULT_SIZES = ['1KB', '100KB', '1MB']
+
+
+def run(args):
+    results = {}
+    for suite in args.suite:
+        print(f'运行 {suite} ...', file=sys.stderr)
+        results.update(SUITES[suite](args.sizes))
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'suites': args.suite,
+            'sizes': args.sizes,
+        },
+        'results': results,
+    }
+    output = BASELINE if args.save_baseline else args.output
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print(f'{len(results)} 个用例，结果已写入 {output}', file=sys.stderr)
+
+
+def compare(args):
+    """对比两次结果，慢了超过阈值的用例算作回退，有回退时退出码为1
+
+    默认比较最小值：同一台机器上它受其它进程干扰最小，比中位数稳定。
+    """
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)['results']
+    with open(args.results, encoding='utf-8') as f:
+        current = json.load(f)['results']
+
+    regressions = 0
+    print(f'{"用例":<60} {"基线":>11} {"本次":>11} {"变化":>8}')
+    for name in sorted(set(baseline) & set(current)):
+        old, new = baseline[name][args.stat], current[name][args.stat]
+        change = new / old - 1 if old else 0.0
+        mark = ''
+        if change > args.threshold:
+            mark = '  回退'
+            regressions += 1
+        elif change < -args.threshold:
+            mark = '  提升'
+        if mark or args.verbose:
+            print(f'{name:<60} {old * 1000:>9.3f}ms {new * 1000:>9.3f}ms {change:>+8.1%}{mark}')
+    missing = sorted(set(baseline) - set(current))
+    if missing:
+        print(f'本次缺少 {len(missing)} 个基线中的用例', file=sys.stderr)
+    print(f'共对比 {len(set(baseline) & set(current))} 个用例，{regressions} 个慢于基线超过 {args.threshold:.0%}')
+    sys.exit(1 if regressions else 0)
+
+
+def memory(args):
+    """检查整体处理时的内存峰值不超过最大一层（输入或某一轮的结果）的 --limit 倍，超过时退出码为1"""
+    results = check_memory(args.size)
+    failed = 0
+    for name, ratio in sorted(results.items()):
+        mark = ''
+        if ratio > args.limit:
+            mark = '  超出'
+            failed += 1
+        print(f'{name:<60} {ratio:>6.2f}x{mark}')
+    print(f'共 {len(results)} 个用例，{failed} 个峰值超过最大一层的 {args.limit} 倍')
+    sys.exit(1 if failed else 0)
+
+
+def corpus(args):
+    paths = write_corpus(args.out_dir, args.sizes, densities=args.density, seed=args.seed)
+    print(f'已生成 {len(paths)} 个文件到 {args.out_dir}', file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m bench', description='JSON转义工具基准测试')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('run', help='运行基准，结果写成JSON')
+    p.add_argument('--suite', nargs='+', choices=list(SUITES), default=list(SUITES),
+                   help='要运行的用例组（默认全部）')
+    p.add_argument('--sizes', nargs='+', choices=list(SIZES), default=DEFAULT_SIZES,
+                   help='语料大小（默认 %(default)s）')
+    p.add_argument('-o', '--output', default='bench-results.json', help='结果文件（默认 %(default)s）')
+    p.add_argument('--save-baseline', action='store_true', help=f'把结果保存为基线 {BASELINE}')
+    p.set_defaults(func=run)
+
+    p = sub.add_parser('compare', help='和基线对比，慢于阈值时退出码为1')
+    p.add_argument('results', nargs='?', default='bench-results.json', help='本次结果（默认 %(default)s）')
+    p.add_argument('--baseline', default=BASELINE, help='基线结果（默认 bench/baseline.json）')
+    p.add_argument('--threshold', type=float, default=0.25, help='允许变慢的比例（默认 %(default)s）')
+    p.add_argument('--stat', choices=['min', 'median'], default='min', help='比较的统计量（默认 %(default)s）')
+    p.add_argument('-v', '--verbose', action='store_true', help='列出所有用例')
+    p.set_defaults(func=compare)
+
+    p = sub.add_parser('memory', help='用 tracemalloc 检查整体处理的内存峰值，超过上限时退出码为1')
+    p.add_argument('--size', choices=list(SIZES), default='100MB', help='输入大小（默认 %(default)s）')
+    p.add_argument('--limit', type=float, default=2.0, help='峰值相对最大一层大小的上限（默认 %(default)s）')
+    p.set_defaults(func=memory)
+
+    p = sub.add_parser('corpus', help='只生成语料文件')
+    p.add_argument('out_dir', help='输出目录')
+    p.add_argument('--sizes', nargs='+', choices=list(SIZES), default=DEFAULT_SIZES)
+    p.add_argument('--density', nargs='+', choices=list(DENSITIES), default=list(DENSITIES))
+    p.add_argument('--seed', type=int, default=0)
+    p.set_defaults(func=corpus)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+"""合成测试语料：按大小、转义层数、中文/emoji比例生成数据，同样的参数总是生成同样的内容"""
+
+import os
+import json
+import random
+
+# 常用汉字和几个emoji（emoji在 \u 转义里是代理对）
+_CJK = '的一是在不了有和人这中大为上个国我以要他时来用们生到作地于出就分对成会可主发年动同工也能下过子说产种面而方后多定行学法所民得经十三之进着等部度家电力里如水化高自二理起小物现实加量都两体制机当使点从业本去把性好应开它合还因由其些然前外天政四日那社义事平形相全表间样与关各重新线内数正心反你明看原又么利比或但质气第向道命此变条只没结解问意建月公无系军很情者最立代想已通并提直题党程展五果料象员革位入常文总次品式活设及管特件长求老头基资边流路级少图山统接知较将组见计别她手角期根论运农指几九区强放决西被干做必战先回则任取据处队南给色光门即保治北造百规热领七海口东导器压志世金增争济阶油思术极交受联什认六共权收证改清己美再采转更单风切打白教速花带安场身车例真务具万每目至达走积示议声报斗完类八离华名确才科张信马节话米整空元况今集温传土许步群广石记需段研界拉林律叫且究观越织装影算低持音众书布复容儿须际商非验连断深难近矿千周委素技备半办青省列习响约支般史感劳便团往酸历市克何除消构府称太准精值号率族维划选标写存候毛亲快效斯院查江型眼王按格养易置派层片始却专状育厂京识适属圆包火住调满县局照参红细引听该铁价严龙飞'
+_EMOJI = '😀😂🥰😎🤔👍🎉🔥🚀🌟🍺🐱'
+_ASCII_WORDS = ('user', 'order', 'status', 'payload', 'message', 'request', 'id', 'name', 'value', 'items',
+                'created', 'updated', 'token', 'region', 'amount', 'currency', 'error', 'trace')
+
+# 语料的字符组成：(中文比例, emoji比例)
+DENSITIES = {
+    'ascii': (0.0, 0.0),
+    'cjk': (0.5, 0.0),
+    'emoji': (0.1, 0.1),
+}
+
+SIZES = {
+    '1KB': 1024,
+    '100KB': 100 * 1024,
+    '1MB': 1024 * 1024,
+    '10MB': 10 * 1024 * 1024,
+    '100MB': 100 * 1024 * 1024,
+}
+
+# 生成语料时不重复的部分的大小
+UNIQUE_BYTES = 1024 * 1024
+
+
+def _word(rng, density):
+    cjk, emoji = DENSITIES[density]
+    r = rng.random()
+    if r < emoji:
+        return ''.join(rng.choice(_EMOJI) for _ in range(rng.randint(1, 3)))
+    if r < emoji + cjk:
+        return ''.join(rng.choice(_CJK) for _ in range(rng.randint(2, 6)))
+    return rng.choice(_ASCII_WORDS)
+
+
+def _record(rng, density):
+    """一条类似接口日志的JSON记录"""
+    return {
+        'id': rng.randint(1, 10 ** 9),
+        'name': _word(rng, density),
+        'ok': rng.random() < 0.9,
+        'score': round(rng.uniform(-1000, 1000), 3),
+        'tags': [_word(rng, density) for _ in range(rng.randint(0, 4))],
+        'detail': {'message': ' '.join(_word(rng, density) for _ in range(rng.randint(3, 12))),
+                   'path': '/api/' + rng.choice(_ASCII_WORDS), 'quote': 'say "hi" \\ bye'},
+    }
+
+
+def escape(s, depth, ensure_ascii=True):
+    """把字符串转义 depth 层（每层相当于放进一个JSON字符串字面量里）
+
+    ensure_ascii 为False时非ASCII字符原样保留，不写成 \\uXXXX。
+    """
+    for _ in range(depth):
+        s = json.dumps(s, ensure_ascii=ensure_ascii)[1:-1]
+    return s
+
+
+def make_json(size, density='ascii', seed=0):
+    """生成大约 size 字符的合法JSON数组，非ASCII字符写成 \\uXXXX 转义
+
+    超过 UNIQUE_BYTES 后循环使用已生成的记录，生成100MB语料时不用等太久。
+    """
+    rng = random.Random(f'{seed}-{density}-{size}')
+    records = []
+    total = 2
+    while total < min(size, UNIQUE_BYTES):
+        text = json.dumps(_record(rng, density))
+        records.append(text)
+        total += len(text) + 2
+    unique = len(records)
+    while total < size:
+        text = records[len(records) % unique]
+        records.append(text)
+        total += len(text) + 2
+    return '[' + ', '.join(records) + ']'
+
+
+def _repeat_items(size, make_item):
+    """用 make_item() 生成的元素拼出大约 size 字符的JSON数组，超过 UNIQUE_BYTES 后循环使用"""
+    items = []
+    total = 2
+    while total < min(size, UNIQUE_BYTES):
+        text = make_item()
+        items.append(text)
+        total += len(text) + 1
+    unique = len(items)
+    while total < size:
+        text = items[len(items) % unique]
+        items.append(text)
+        total += len(text) + 1
+    return '[' + ','.join(items) + ']'
+
+
+def make_number_array(size, seed=0):
+    """大约 size 字符、包在对象里的浮点数数组（完整解析时每个元素都是一个 float 对象）"""
+    rng = random.Random(f'numbers-{seed}-{size}')
+    return '{"values": %s}' % _repeat_items(size, lambda: repr(round(rng.uniform(-1000, 1000), 3)))
+
+
+def make_string_array(size, seed=0):
+    """大约 size 字符、包在对象里的短字符串数组（完整解析时每个元素都是一个 str 对象）"""
+    rng = random.Random(f'strings-{seed}-{size}')
+    return '{"values": %s}' % _repeat_items(size, lambda: json.dumps(rng.choice(_ASCII_WORDS)[:rng.randint(2, 8)]))
+
+
+def make_text(size, density='cjk', seed=0):
+    """大约 size 字节的一段长文本包在对象里，非ASCII字符原样写出（不是 \\uXXXX）"""
+    rng = random.Random(f'text-{seed}-{density}-{size}')
+    words = []
+    total = 0
+    while total < min(size, UNIQUE_BYTES):
+        word = _word(rng, density)
+        words.append(word)
+        total += len(word.encode('utf-8')) + 1
+    unique = ' '.join(words).encode('utf-8')
+    text = (unique * (size // len(unique) + 1))[:size].decode('utf-8', 'ignore')
+    return json.dumps({'text': text}, ensure_ascii=False)
+
+
+def make_payload(size, depth, density='ascii', seed=0):
+    """转义了 depth 层的JSON，size 是转义前的大小"""
+    return escape(make_json(size, density, seed), depth)
+
+
+def make_log_lines(size, density='ascii', seed=0, max_depth=3):
+    """混合日志：普通文本行、整行被转义的JSON、行内嵌着被转义JSON的日志行"""
+    rng = random.Random(f'log-{seed}-{density}-{size}')
+    lines = []
+    total = 0
+    while total < size:
+        record = json.dumps(_record(rng, density))
+        shape = rng.random()
+        depth = rng.randint(1, max_depth)
+        if shape < 0.2:
+            line = f'2024-01-01 12:00:{rng.randint(10, 59)} INFO plain message without json'
+        elif shape < 0.5:
+            line = escape(record, depth)
+        else:
+            line = f'2024-01-01 12:00:{rng.randint(10, 59)} INFO request body={escape(record, depth)} cost=12ms'
+        lines.append(line)
+        total += len(line) + 1
+    return '\n'.join(lines) + '\n'
+
+
+def write_corpus(out_dir, sizes=('1KB', '100KB', '1MB'), depths=range(7), densities=tuple(DENSITIES), seed=0):
+    """把语料写成文件，返回写出的文件路径列表"""
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for size_name in sizes:
+        size = SIZES[size_name]
+        for density in densities:
+            for depth in depths:
+                path = os.path.join(out_dir, f'payload-{size_name}-d{depth}-{density}.txt')
+                with open(path, 'w', encoding='utf-8') as f:
+                    f.write(make_payload(size, depth, density, seed))
+                paths.append(path)
+            path = os.path.join(out_dir, f'log-{size_name}-{density}.txt')
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(make_log_lines(size, density, seed))
+            paths.append(path)
+    return paths
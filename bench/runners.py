@@ -0,0 +1,199 @@
+"""基准用例：核心函数、命令行端到端和 Flask /unescape 路由
+
+每个用例返回 {名称: 结果}，结果包含每次调用耗时的中位数和最小值（秒）、输入大小和吞吐量。
+"""
+
+import os
+import sys
+import json
+import timeit
+import tempfile
+import tracemalloc
+import statistics
+import subprocess
+
+import unescape_core
+from unescape_core import UnescapeTrace, is_valid_json, multi_unescape, unescape_lines, unicode_to_chinese_only
+
+from bench.corpus import (DENSITIES, SIZES, escape, make_json, make_log_lines, make_number_array, make_payload,
+                          make_string_array, make_text)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CLI = os.path.join(ROOT, 'unescape_json.py')
+
+# 每个样本至少运行的时间（秒）和样本数
+MIN_SAMPLE_SECONDS = 0.05
+REPEAT = 5
+# 命令行用例启动一次解释器，只跑几次
+CLI_REPEAT = 3
+
+
+def _fresh(fn):
+    """每次调用前清掉 is_valid_json 的单条缓存，避免重复计时同一输入时直接命中"""
+    def run():
+        unescape_core._last_parsed = None
+        fn()
+    return run
+
+
+def measure(fn, input_bytes, repeat=REPEAT, number=None):
+    """多次计时 fn，返回每次调用耗时的统计"""
+    timer = timeit.Timer(_fresh(fn))
+    if number is None:
+        number = 1
+        while True:
+            if timer.timeit(number) >= MIN_SAMPLE_SECONDS:
+                break
+            number *= 10
+    samples = [t / number for t in timer.repeat(repeat, number)]
+    median = statistics.median(samples)
+    return {
+        'median': median,
+        'min': min(samples),
+        'runs': repeat * number,
+        'input_bytes': input_bytes,
+        'mb_per_s': round(input_bytes / median / 1e6, 3) if median else None,
+    }
+
+
+def _sized(text):
+    return len(text.encode('utf-8'))
+
+
+def bench_core(sizes, depths=range(7)):
+    """核心函数：各层数的自动unescape、JSON校验、Unicode转换和逐行处理"""
+    results = {}
+    for size_name in sizes:
+        size = SIZES[size_name]
+        for depth in depths:
+            payload = make_payload(size, depth)
+            results[f'core.multi_unescape.{size_name}.d{depth}.ascii'] = measure(
+                lambda: multi_unescape(payload), _sized(payload))
+        for density in DENSITIES:
+            payload = make_payload(size, 2, density)
+            if density != 'ascii':
+                results[f'core.multi_unescape.{size_name}.d2.{density}'] = measure(
+                    lambda: multi_unescape(payload), _sized(payload))
+            results[f'core.multi_unescape_json.{size_name}.d2.{density}'] = measure(
+                lambda: multi_unescape(payload, engine='json'), _sized(payload))
+
+        valid = make_json(size)
+        results[f'core.is_valid_json.{size_name}.valid'] = measure(lambda: is_valid_json(valid), _sized(valid))
+        invalid = valid[:-1]
+        results[f'core.is_valid_json.{size_name}.truncated'] = measure(lambda: is_valid_json(invalid),
+                                                                       _sized(invalid))
+
+        for density in ('cjk', 'emoji'):
+            text = make_json(size, density)
+            results[f'core.unicode_to_chinese_only.{size_name}.{density}'] = measure(
+                lambda: unicode_to_chinese_only(text), _sized(text))
+            results[f'core.unicode_to_chinese_only.{size_name}.{density}.cjk_range'] = measure(
+                lambda: unicode_to_chinese_only(text, 'cjk'), _sized(text))
+
+        for density in DENSITIES:
+            log = make_log_lines(size, density)
+            lines = log.splitlines()
+            results[f'core.unescape_lines.{size_name}.log.{density}'] = measure(
+                lambda: sum(1 for _ in unescape_lines(lines)), _sized(log))
+            results[f'core.unescape_lines_extract.{size_name}.log.{density}'] = measure(
+                lambda: sum(1 for _ in unescape_lines(lines, extract=True)), _sized(log))
+    return results
+
+
+def bench_cli(sizes):
+    """命令行端到端：启动解释器、读文件、转义、写文件，包含约几十毫秒的启动时间"""
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        out = os.path.join(tmp, 'out.txt')
+        for size_name in sizes:
+            size = SIZES[size_name]
+            cases = []
+            payload = os.path.join(tmp, f'payload-{size_name}.txt')
+            with open(payload, 'w', encoding='utf-8') as f:
+                f.write(make_payload(size, 2, 'cjk'))
+            cases.append((f'cli.whole.{size_name}.d2.cjk', payload, ['-zh']))
+            log = os.path.join(tmp, f'log-{size_name}.txt')
+            with open(log, 'w', encoding='utf-8') as f:
+                f.write(make_log_lines(size, 'cjk'))
+            cases.append((f'cli.lines.{size_name}.log.cjk', log, ['--lines', '-zh']))
+            cases.append((f'cli.lines_extract.{size_name}.log.cjk', log, ['--lines', '--extract', '-zh']))
+            # 重复处理同一份日志，缓存已经预热，每行都命中
+            cache = os.path.join(tmp, f'cache-{size_name}.sqlite3')
+            cache_flags = ['--lines', '-zh', '--cache', cache]
+            subprocess.run([sys.executable, CLI, log, '-o', out] + cache_flags, check=True)
+            cases.append((f'cli.lines_cached.{size_name}.log.cjk', log, cache_flags))
+            for name, path, flags in cases:
+                cmd = [sys.executable, CLI, path, '-o', out] + flags
+                results[name] = measure(lambda: subprocess.run(cmd, check=True, stderr=subprocess.DEVNULL),
+                                        os.path.getsize(path), repeat=CLI_REPEAT, number=1)
+    return results
+
+
+def bench_web(sizes):
+    """Flask /unescape 路由（测试客户端，不经过网络），关闭结果缓存和处理预算"""
+    from web_unescape_json import app
+    app.config['RESULT_CACHE_ENABLED'] = False
+    app.config['MAX_INPUT_BYTES'] = None
+    app.config['MAX_TOTAL_BYTES'] = None
+    app.config['MAX_SECONDS'] = None
+    client = app.test_client()
+    results = {}
+    for size_name in sizes:
+        size = SIZES[size_name]
+        for density, convert in (('ascii', False), ('cjk', True)):
+            body = json.dumps({'text': make_payload(size, 2, density), 'convert_unicode': convert})
+            name = f'web.unescape.{size_name}.d2.{density}' + ('.zh' if convert else '')
+            results[name] = measure(
+                lambda: client.post('/unescape', data=body, content_type='application/json'), _sized(body))
+        log = make_log_lines(size, 'cjk')
+        results[f'web.unescape_stream.{size_name}.log.cjk'] = measure(
+            lambda: client.post('/unescape?convert_unicode=1', data=log.encode('utf-8'),
+                                content_type='text/plain').get_data(), _sized(log))
+    return results
+
+
+# 内存检查的输入形状：名称 -> (生成函数(大小), 转义时是否保留非ASCII字符)
+MEMORY_SHAPES = {
+    'records.ascii': (lambda size: make_json(size, 'ascii'), True),
+    'records.cjk': (lambda size: make_json(size, 'cjk'), True),
+    'numbers': (make_number_array, True),
+    'strings': (make_string_array, True),
+    'text.cjk': (lambda size: make_text(size, 'cjk'), False),
+}
+
+
+def check_memory(size_name, engines=('unicode_escape', 'json'), shapes=tuple(MEMORY_SHAPES), depth=2):
+    """整体处理一个文件时的内存峰值（tracemalloc），返回 {名称: 峰值/最大一层的大小}
+
+    走命令行的 unescape_file：内存映射读入、字节缓冲区流水线、-zh 原地转换、写出文件。
+    最大一层取输入和每一轮结果中最大的一个：unicode_escape 引擎会把原样写出的非ASCII
+    字节按Latin-1读成两倍，这时结果本身就比输入大。
+    """
+    from unescape_json import unescape_file
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'payload.txt')
+        out = os.path.join(tmp, 'out.txt')
+        for shape in shapes:
+            make, ensure_ascii = MEMORY_SHAPES[shape]
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(escape(make(SIZES[size_name]), depth, ensure_ascii))
+            input_bytes = os.path.getsize(path)
+            for engine in engines:
+                trace = UnescapeTrace()
+                tracemalloc.start()
+                try:
+                    unescape_file(path, out, engine=engine, convert_unicode=True, trace=trace)
+                    peak = tracemalloc.get_traced_memory()[1]
+                finally:
+                    tracemalloc.stop()
+                largest = max([input_bytes] + [size for _, size in trace.pass_bytes])
+                results[f'memory.unescape_file.{size_name}.d{depth}.{shape}.{engine}'] = peak / largest
+    return results
+
+
+SUITES = {
+    'core': bench_core,
+    'cli': bench_cli,
+    'web': bench_web,
+}
@@ -1,58 +1,115 @@
 #!/usr/bin/env python3
 
-import sys
-import re
-import json
 import os
+import sys
+import argparse
 
+from unescape_core import (ENGINES, DEFAULT_ENGINE, MAX_AUTO_TIMES, UNICODE_RANGES, is_valid_json, unescape,
+                           unescape_lines)
 
-def is_valid_json(s):
-    """检查字符串是否为有效的JSON格式"""
-    try:
-        json.loads(s)
-        return True
-    except Exception:
-        return False
+# 多行粘贴模式的默认结束标记
+DEFAULT_SENTINEL = 'END'
+# 批量模式每攒够这么多行写出一次
+BATCH_WRITE_LINES = 1000
 
 
-def multi_unescape(s, times=None):
-    """多次unescape字符串，支持自动检测合法JSON"""
-    if is_valid_json(s):
-        return s
-    if times is None:
-        temp = s
-        for i in range(10):
-            try:
-                s_new = bytes(s, "utf-8").decode("unicode_escape")
-            except Exception as e:
-                print(f"Exception occurred at unescape #{i+1}: {e}, stop converting.", file=sys.stderr)
-                break
-            if '\\x' in s_new:
-                print(f"Found \\x escape after unescape #{i+1}, stop converting.", file=sys.stderr)
-                break
-            s = s_new
-            if is_valid_json(s):
-                return s
-        return temp
-    else:
-        for i in range(times):
-            try:
-                s_new = bytes(s, "utf-8").decode("unicode_escape")
-            except Exception as e:
-                print(f"Exception occurred at unescape #{i+1}: {e}, stop converting.", file=sys.stderr)
-                break
-            s = s_new
-        return s
+def run_batch(settings, input_stream=None, output_stream=None):
+    """非交互的批量模式：逐行读取，每行单独转义后写出，参数只在命令行给一次"""
+    input_stream = input_stream or sys.stdin
+    output_stream = output_stream or sys.stdout
+    results = unescape_lines(input_stream, settings['times'], settings['engine'], settings['zh'],
+                             settings['extract'], settings['zh_range'])
+    buffer = []
+    for result in results:
+        buffer.append(result)
+        buffer.append('\n')
+        if len(buffer) >= 2 * BATCH_WRITE_LINES:
+            output_stream.write(''.join(buffer))
+            buffer = []
+    output_stream.write(''.join(buffer))
 
 
-def unicode_to_chinese_only(s):
-    """将Unicode编码转换为中文字符"""
-    def repl(match):
-        return chr(int(match.group(1), 16))
-    return re.sub(r'\\u([0-9a-fA-F]{4})', repl, s)
+def read_paste(sentinel):
+    """多行粘贴：读到只有结束标记的一行或 EOF 为止"""
+    print(f"进入多行粘贴模式，单独一行输入 {sentinel} 结束（或按 Ctrl-D）：")
+    lines = []
+    while True:
+        try:
+            line = input()
+        except EOFError:
+            break
+        if line.strip() == sentinel:
+            break
+        lines.append(line)
+    return '\n'.join(lines).strip()
 
 
-def main():
+def print_diagnostic(message):
+    print(message, file=sys.stderr)
+
+
+def convert(text, settings):
+    """按会话设置转义一条输入，返回 (结果, 是否为合法JSON)"""
+    result = unescape(text, settings['times'], settings['engine'], settings['zh'], settings['extract'],
+                      settings['zh_range'], diagnostic=print_diagnostic)
+    # 转义时已经校验过结果（转中文改变了文本时校验的是转换后的），直接用它；
+    # 只有指定次数时最后一轮之后没有校验过
+    valid = result.valid if result.valid is not None else is_valid_json(result.text)
+    return result.text, valid
+
+
+def describe(settings):
+    times = settings['times'] if settings['times'] is not None else '自动'
+    zh = '开' if settings['zh'] else '关'
+    if settings['zh'] and settings['zh_range']:
+        zh += f"（{settings['zh_range']}）"
+    return (f"当前设置：转义次数 {times}，转中文 {zh}，引擎 {settings['engine']}，"
+            f"提取内嵌JSON {'开' if settings['extract'] else '关'}")
+
+
+def handle_command(user_input, settings):
+    """处理设置命令，是命令时返回True"""
+    parts = user_input.split()
+    command = parts[0].lower() if parts else ''
+    value = user_input[len(parts[0]):].strip() if parts else ''
+    if command == 'engine':
+        if value in ENGINES:
+            settings['engine'] = value
+            print(f"已切换到 {value} 引擎")
+        else:
+            print(f"当前引擎: {settings['engine']}，可选：{', '.join(sorted(ENGINES))}")
+    elif command == 'times':
+        if value in ('', '0', 'auto'):
+            settings['times'] = None
+            print("转义次数：自动检测")
+        elif value.isdigit() and 1 <= int(value) <= MAX_AUTO_TIMES:
+            settings['times'] = int(value)
+            print(f"转义次数：{value}")
+        else:
+            print(f"转义次数必须在1-{MAX_AUTO_TIMES}之间，或 0/auto 表示自动检测")
+    elif command == 'zh':
+        if value.lower() in ('on', 'y', 'yes', '1', '开'):
+            settings['zh'] = True
+        elif value.lower() in ('off', 'n', 'no', '0', '关'):
+            settings['zh'] = False
+        elif value in UNICODE_RANGES:
+            settings['zh'], settings['zh_range'] = True, value
+        elif value == 'all':
+            settings['zh'], settings['zh_range'] = True, None
+        else:
+            settings['zh'] = not settings['zh']
+        print(describe(settings))
+    elif command == 'extract':
+        settings['extract'] = value.lower() not in ('off', 'n', 'no', '0', '关')
+        print(describe(settings))
+    elif command == 'settings':
+        print(describe(settings))
+    else:
+        return False
+    return True
+
+
+def run_interactive(settings, sentinel):
     """交互式主函数"""
     print("=" * 60)
     print("JSON转义工具 - 交互式版本")
@@ -62,14 +119,20 @@ def main():
     print("2. 支持Unicode转中文")
     print("3. 输入 'quit' 或 'exit' 退出程序")
     print("4. 输入 'clear' 清空屏幕")
+    print(f"5. 输入 'paste' 进入多行粘贴模式，单独一行 {sentinel} 结束")
+    print("6. 设置在本次会话中一直有效：")
+    print(f"   'times <1-{MAX_AUTO_TIMES}|auto>' 转义次数，'zh <on|off|{'|'.join(sorted(UNICODE_RANGES))}|all>' 转中文，")
+    print(f"   'engine <名称>' 切换unescape引擎（可选：{', '.join(sorted(ENGINES))}），"
+          "'extract <on|off>' 只处理内嵌JSON，'settings' 查看设置")
     print("=" * 60)
-    
+    print(describe(settings))
+
     while True:
         try:
             # 获取用户输入
             print("\n请输入要转义的JSON字符串：")
             user_input = input("> ").strip()
-            
+
             # 处理特殊命令
             if user_input.lower() in ['quit', 'exit', 'q']:
                 print("感谢使用，再见！")
@@ -77,59 +140,31 @@ def main():
             elif user_input.lower() == 'clear':
                 os.system('clear' if os.name == 'posix' else 'cls')
                 continue
-            elif not user_input:
+            elif user_input.lower() == 'paste':
+                user_input = read_paste(sentinel)
+            elif handle_command(user_input, settings):
+                continue
+
+            if not user_input:
                 print("请输入内容！")
                 continue
-            
-            # 询问转义次数
-            print("转义次数？(0-10，0或留空表示自动检测，默认0): ", end="")
-            times_input = input().strip()
-            escape_times = None
-            if times_input and times_input != '0':
-                try:
-                    escape_times = int(times_input)
-                    if escape_times < 1 or escape_times > 10:
-                        print("转义次数必须在1-10之间，使用自动检测")
-                        escape_times = None
-                except ValueError:
-                    print("输入无效，使用自动检测")
-                    escape_times = None
-            
-            # 询问是否转换为中文
-            print("是否转换为中文？(y/n，默认n): ", end="")
-            convert_choice = input().strip().lower()
-            convert_unicode = convert_choice in ['y', 'yes', '是']
-            
+
             print("\n处理中...")
-            
-            # 执行转义
-            result = multi_unescape(user_input, escape_times)
-            
-            # 如果需要转换为中文
-            if convert_unicode:
-                result = unicode_to_chinese_only(result)
-            
+            result, valid = convert(user_input, settings)
+
             # 显示结果
             print("\n" + "=" * 40)
             print("转义结果：")
             print("=" * 40)
             print(result)
             print("=" * 40)
-            
-            # 检查结果是否为有效JSON
-            if is_valid_json(result):
+
+            if valid:
                 print("✓ 结果为有效的JSON格式")
             else:
                 print("⚠ 结果可能不是有效的JSON格式")
-            
-            # 询问是否继续
-            print("\n是否继续？(y/n，默认y): ", end="")
-            continue_choice = input().strip().lower()
-            if continue_choice in ['n', 'no', '否']:
-                print("感谢使用，再见！")
-                break
-                
-        except KeyboardInterrupt:
+
+        except (KeyboardInterrupt, EOFError):
             print("\n\n程序被中断，再见！")
             break
         except Exception as e:
@@ -137,5 +172,49 @@ def main():
             print("请重试或输入 'quit' 退出")
 
 
+def main():
+    parser = argparse.ArgumentParser(
+        description="JSON转义工具交互式版本；标准输入不是终端时自动进入批量模式，逐行转义\n"
+                    "Interactive JSON unescape tool; switches to line-by-line batch mode when stdin is not a terminal",
+        epilog="示例 Example:\n"
+               "  python3 interactive_unescape_json.py\n"
+               "  cat records.txt | python3 interactive_unescape_json.py -zh > out.txt",
+        formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument('-n', '--number', type=int,
+                        help='unescape 次数（默认自动检测）\nNumber of unescape (default: auto)')
+    parser.add_argument('-zh', action='store_true',
+                        help='unescape 后再进行 unicode 转中文 (Convert unicode to Chinese after unescape)')
+    parser.add_argument('--zh-range', choices=sorted(UNICODE_RANGES),
+                        help='配合 -zh，只转换指定范围内的字符\nWith -zh, only convert characters in this range')
+    parser.add_argument('--engine', choices=sorted(ENGINES), default=DEFAULT_ENGINE,
+                        help='unescape 引擎（默认 %(default)s）\nUnescape engine (default: %(default)s)')
+    parser.add_argument('--extract', action='store_true',
+                        help='只unescape行内被转义的JSON片段\nOnly unescape escaped JSON spans embedded in text')
+    parser.add_argument('--sentinel', default=DEFAULT_SENTINEL,
+                        help='多行粘贴模式的结束标记（默认 %(default)s）\nLine that ends multi-line paste mode (default: %(default)s)')
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--batch', action='store_true',
+                      help='强制批量模式 (Force batch mode)')
+    mode.add_argument('--interactive', action='store_true',
+                      help='强制交互模式 (Force interactive mode)')
+    args = parser.parse_args()
+
+    if args.number is not None and not 1 <= args.number <= MAX_AUTO_TIMES:
+        parser.error(f"转义次数必须在1-{MAX_AUTO_TIMES}之间\n--number must be between 1 and {MAX_AUTO_TIMES}")
+
+    settings = {
+        'times': args.number,
+        'zh': args.zh,
+        'zh_range': args.zh_range,
+        'engine': args.engine,
+        'extract': args.extract,
+    }
+    if args.batch or (not args.interactive and not sys.stdin.isatty()):
+        run_batch(settings)
+    else:
+        run_interactive(settings, args.sentinel)
+
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
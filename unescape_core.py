@@ -0,0 +1,1206 @@
+#!/usr/bin/env python3
+"""JSON转义核心逻辑，供命令行、Web和交互式版本共用，也可以直接导入使用
+
+    from unescape_core import unescape, unescape_iter, unescape_many
+
+    unescape(text) 处理一条，unescape_iter(可迭代对象) 逐条按需处理，unescape_many(列表, workers=4)
+    多进程批量处理，都返回 UnescapeResult（结果文本、轮数、停止原因、是否为合法JSON）。
+"""
+
+import re
+import sys
+import json
+import time
+import codecs
+from collections import namedtuple
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+from json.decoder import scanstring
+
+# 自动模式下最多unescape的次数
+MAX_AUTO_TIMES = 10
+# unescape_many 多进程时每块的条数
+MANY_CHUNK_ITEMS = 1000
+# 提取片段的扫描每处理这么多个记号检查一次是否取消或超时
+SCAN_CHECK_TOKENS = 4096
+
+# 字符串中第一个 \u 及其前面的反斜杠
+_U_ESCAPE_RE = re.compile(r'(\\+)u[0-9a-fA-F]{4}')
+# 连续的一串 \uXXXX
+_U_RUN_RE = re.compile(r'(?:\\u[0-9a-fA-F]{4})+')
+# JSON字符串里不合法的转义：一串反斜杠配对之后落单的那个，后面不是合法的转义字符
+_BAD_JSON_ESCAPE_RE = re.compile(r'\\(?<!\\\\)(?:\\\\)*(?![\\"/bfnrt]|u[0-9a-fA-F]{4})')
+# 代理区的字符（解码后落单的代理）
+_SURROGATE_RE = re.compile('[\ud800-\udfff]')
+# 解码出的代理对或落单的代理
+_SURROGATE_PAIR_RE = re.compile('[\ud800-\udbff][\udc00-\udfff]|[\ud800-\udfff]')
+# 扫描内嵌JSON时关心的token：引号（连同前面的整串反斜杠）、后面紧跟带反斜杠引号的左括号
+# （片段的开头，只向前看不回溯）和其它括号
+_SPAN_TOKEN_RE = re.compile(r'(?<!\\)(\\*)"|[{\[](?=\s*(\\+)")|[{}\[\]]')
+
+
+_WHITESPACE = ' \t\n\r'
+# json.loads 也接受 NaN、Infinity、-Infinity
+_VALUE_START = '{["-0123456789tfnNI'
+_VALUE_END = '"}]0123456789elNy'
+_CLOSER = {'{': '}', '[': ']'}
+
+# 最近一次完整解析的 (字符串, 结果)
+_last_parsed = None
+
+
+def _escaped_at(s, i):
+    """s[i] 前面是否有奇数个反斜杠"""
+    j = i
+    while j > 0 and s[j - 1] == '\\':
+        j -= 1
+    return (i - j) % 2 == 1
+
+
+def _looks_like_json(s):
+    """只看首尾的token做常数时间检查，返回False表示一定不是合法JSON"""
+    n = len(s)
+    i = 0
+    while i < n and s[i] in _WHITESPACE:
+        i += 1
+    if i == n:
+        return False
+    j = n - 1
+    while s[j] in _WHITESPACE:
+        j -= 1
+    first, last = s[i], s[j]
+    if first in _CLOSER:
+        if i == j or last != _CLOSER[first]:
+            return False
+        # 开头的第一个token：对象必须以键或 } 开始
+        k = i + 1
+        while s[k] in _WHITESPACE:
+            k += 1
+        if s[k] not in ('"}' if first == '{' else _VALUE_START + ']'):
+            return False
+        # 结尾的最后一个token：必须是值的结尾或空容器，且引号不能是被转义的
+        k = j - 1
+        while s[k] in _WHITESPACE:
+            k -= 1
+        if k == i:
+            return True
+        if s[k] not in _VALUE_END:
+            return False
+        return s[k] != '"' or not _escaped_at(s, k)
+    if first == '"':
+        return i < j and last == '"' and not _escaped_at(s, j)
+    if first in '-0123456789':
+        return last in '0123456789y'
+    if first in 'tfnNI':
+        return s[i:j + 1] in ('true', 'false', 'null', 'NaN', 'Infinity')
+    return False
+
+
+def is_valid_json(s):
+    """检查字符串是否为有效的JSON格式
+
+    先用首尾检查排除明显不是JSON的输入，通过后才完整解析；
+    最近一次完整解析的结果会被缓存，同一个字符串再次检查时直接返回。
+    """
+    global _last_parsed
+    cached = _last_parsed
+    if cached is not None and (cached[0] is s or cached[0] == s):
+        return cached[1]
+    if not _looks_like_json(s):
+        return False
+    try:
+        json.loads(s)
+        ok = True
+    except Exception:
+        ok = False
+    _last_parsed = (s, ok)
+    return ok
+
+
+class UnescapeLimitExceeded(Exception):
+    """超出处理预算，附带截至目前的处理情况"""
+
+    def __init__(self, limit, message, passes, processed_bytes, elapsed):
+        super().__init__(message)
+        self.limit = limit
+        self.passes = passes
+        self.processed_bytes = processed_bytes
+        self.elapsed = elapsed
+
+    def diagnostics(self):
+        return {
+            'limit': self.limit,
+            'passes': self.passes,
+            'processed_bytes': self.processed_bytes,
+            'elapsed': round(self.elapsed, 3),
+        }
+
+
+class UnescapeCancelled(UnescapeLimitExceeded):
+    """处理被调用方取消（如有了更新的输入），limit 为 'cancelled'"""
+
+
+class UnescapeBudget:
+    """一次请求的处理预算，None 表示不限制
+
+    大小按字符数计算（ASCII下即字节数）。max_total_bytes 是所有unescape和完整解析
+    处理过的字符总数；截止时间用单调时钟记录，传到同一台机器的子进程中依然有效。
+    cancel_event 为 threading.Event 等带 is_set() 的对象，置位后在下一轮开始前
+    抛出 UnescapeCancelled。
+    """
+
+    def __init__(self, max_input_bytes=None, max_total_bytes=None, max_seconds=None, cancel_event=None):
+        self.max_input_bytes = max_input_bytes
+        self.max_total_bytes = max_total_bytes
+        self.max_seconds = max_seconds
+        self.cancel_event = cancel_event
+        self.started = time.monotonic()
+        self.deadline = None if max_seconds is None else self.started + max_seconds
+        self.passes = 0
+        self.processed_bytes = 0
+
+    def _fail(self, limit, message, error=UnescapeLimitExceeded):
+        raise error(limit, message, self.passes, self.processed_bytes, time.monotonic() - self.started)
+
+    def check_input(self, s):
+        if self.max_input_bytes is not None and len(s) > self.max_input_bytes:
+            self._fail('input_bytes', f'输入过大：{len(s)} 超过上限 {self.max_input_bytes}')
+
+    def check(self):
+        """只检查是否取消和超时，供长时间的扫描中途调用"""
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            self._fail('cancelled', '处理已取消', UnescapeCancelled)
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            self._fail('seconds', f'处理时间超过上限 {self.max_seconds} 秒')
+
+    def charge(self, s, is_pass=False):
+        """处理 s 之前调用，累计处理量并检查是否取消、总量和时间"""
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            self._fail('cancelled', '处理已取消', UnescapeCancelled)
+        self.processed_bytes += len(s)
+        if is_pass:
+            self.passes += 1
+        if self.max_total_bytes is not None and self.processed_bytes > self.max_total_bytes:
+            self._fail('total_bytes', f'处理量超过上限 {self.max_total_bytes}')
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            self._fail('seconds', f'处理时间超过上限 {self.max_seconds} 秒')
+
+
+class UnescapeTrace:
+    """记录处理过程中各阶段的耗时和自动检测结果，不传时不计时
+
+    stages 为 {阶段名: 累计秒数}；pass_seconds[i] 和 pass_bytes[i] 为第 i+1 轮unescape的
+    累计秒数和 [输入, 输出] 字符数；outcomes 为 {自动检测结果: 次数}，stops 为
+    {停止原因: 次数}（valid_json、x_escape、exception、max_passes、times_reached，
+    提前判定不可能得到合法JSON时为 no_escapes、bad_start、truncated、unbalanced，
+    提取片段时还有 invalid_span），逐行或提取片段时会累计多次。
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.pass_seconds = []
+        self.pass_bytes = []
+        self.passes = 0
+        self.outcomes = {}
+        self.stops = {}
+
+    def add(self, stage, seconds):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def add_pass(self, i, seconds, bytes_in, bytes_out):
+        self.passes += 1
+        if i < len(self.pass_seconds):
+            self.pass_seconds[i] += seconds
+            self.pass_bytes[i][0] += bytes_in
+            self.pass_bytes[i][1] += bytes_out
+        else:
+            self.pass_seconds.append(seconds)
+            self.pass_bytes.append([bytes_in, bytes_out])
+        self.add('unescape', seconds)
+
+    def finish(self, outcome, stop):
+        self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+        self.stops[stop] = self.stops.get(stop, 0) + 1
+
+    def merge(self, other):
+        """把另一个 trace 的统计累加进来"""
+        for stage, seconds in other.stages.items():
+            self.add(stage, seconds)
+        for i, (seconds, (bytes_in, bytes_out)) in enumerate(zip(other.pass_seconds, other.pass_bytes)):
+            if i < len(self.pass_seconds):
+                self.pass_seconds[i] += seconds
+                self.pass_bytes[i][0] += bytes_in
+                self.pass_bytes[i][1] += bytes_out
+            else:
+                self.pass_seconds.append(seconds)
+                self.pass_bytes.append([bytes_in, bytes_out])
+        self.passes += other.passes
+        for outcome, count in other.outcomes.items():
+            self.outcomes[outcome] = self.outcomes.get(outcome, 0) + count
+        for stop, count in other.stops.items():
+            self.stops[stop] = self.stops.get(stop, 0) + count
+
+
+# 一条输入的处理结果：text 为结果文本，passes 为结果经过的unescape轮数（自动模式没有得到
+# 合法JSON、返回原输入时为0），stop 为停止原因（见 UnescapeTrace），valid 为结果是否为合法
+# JSON，指定次数时最后一轮之后不再校验，为None；提取片段时 valid 表示找到了片段且都是合法JSON
+UnescapeResult = namedtuple('UnescapeResult', ['text', 'passes', 'stop', 'valid'])
+
+
+def _join_surrogate(m):
+    pair = m.group()
+    if len(pair) == 2:
+        return chr(0x10000 + ((ord(pair[0]) - 0xD800) << 10) + ord(pair[1]) - 0xDC00)
+    return '\\u%04x' % ord(pair)
+
+
+def _join_surrogates(s):
+    """合并解码出的代理对，落单的代理恢复成 \\uXXXX 转义，结果总能按UTF-8编码"""
+    if not _SURROGATE_RE.search(s):
+        return s
+    return _SURROGATE_PAIR_RE.sub(_join_surrogate, s)
+
+
+def _unicode_escape_once(s):
+    """用 unicode_escape 编解码器unescape一次（按Latin-1解读，非ASCII字符会乱码）
+
+    \\uXXXX 代理对会合并成一个字符，落单的代理保留转义。
+    """
+    return _join_surrogates(bytes(s, "utf-8").decode("unicode_escape"))
+
+
+def _scan_segment(s, start, end, parts):
+    """用 scanstring 解码 s[start:end]（其中没有非JSON转义），结果追加到 parts，裸引号原样保留"""
+    src = s[start:end] + '"'
+    n = end - start
+    pos = 0
+    while pos < n:
+        chunk, pos = scanstring(src, pos, False)
+        parts.append(chunk)
+        if pos <= n:
+            parts.append('"')
+
+
+def _json_unescape_once(s):
+    """按JSON字符串字面量的规则unescape一次
+
+    普通字符整段交给C实现的 scanstring 处理，没有裸引号和非法转义时一次调用
+    就得到结果；\\uXXXX 代理对会合并成一个字符，落单的代理保留转义，已有的中文保持不变。
+    非JSON转义（如 \\x41）原样保留，\\' 转为 ' 以和 unicode_escape 一致；整段解码失败或
+    有裸引号时，先用正则一次找出所有非JSON转义，scanstring 只处理它们之间的片段，
+    不靠异常逐个定位（每次异常都要从头数行列号）。
+    """
+    tail = ''
+    n = len(s)
+    i = n
+    while i > 0 and s[i - 1] == '\\':
+        i -= 1
+    if (n - i) % 2:
+        # 末尾落单的反斜杠会吞掉哨兵引号，单独保留
+        tail = '\\'
+        n -= 1
+    src = s[:n] + '"'
+    try:
+        chunk, end = scanstring(src, 0, False)
+        if end > n:
+            return _join_surrogates(chunk) + tail
+    except json.JSONDecodeError:
+        pass
+    parts = []
+    pos = 0
+    for m in _BAD_JSON_ESCAPE_RE.finditer(s, 0, n):
+        bad = m.end() - 1
+        if bad > pos:
+            _scan_segment(s, pos, bad, parts)
+        if s[bad + 1] == "'":
+            parts.append("'")
+            pos = bad + 2
+        else:
+            parts.append('\\')
+            pos = bad + 1
+    if pos < n:
+        _scan_segment(s, pos, n, parts)
+    return _join_surrogates(''.join(parts)) + tail
+
+
+# 可选的unescape引擎
+ENGINES = {
+    'unicode_escape': _unicode_escape_once,
+    'json': _json_unescape_once,
+}
+DEFAULT_ENGINE = 'unicode_escape'
+
+
+def _depth_from_run(run):
+    """由反斜杠个数推算转义层数，run+1 不是2的幂时返回None"""
+    n = run + 1
+    if n & (n - 1):
+        return None
+    return n.bit_length() - 1
+
+
+def detect_escape_depth(s):
+    """单次扫描推断字符串被转义的层数，无法判断时返回None
+
+    JSON每被转义一次，引号前的反斜杠数 r 变为 2r+1，其它字符前的反斜杠数翻倍。
+    合法JSON中的第一个引号一定是结构层的引号（前面没有反斜杠），所以转义 k 层后
+    第一个引号前恰好有 2^k-1 个反斜杠；没有引号时再看第一个 \\uXXXX，
+    原始JSON里的 \\u 转义 k 层后前面有 2^k 个反斜杠。
+    """
+    i = s.find('"')
+    if i != -1:
+        j = i
+        while j > 0 and s[j - 1] == '\\':
+            j -= 1
+        return _depth_from_run(i - j)
+    m = _U_ESCAPE_RE.search(s)
+    if m:
+        return _depth_from_run(len(m.group(1)) - 1)
+    return None
+
+
+def _unescape_pass(s, i, unescape_once, budget, trace):
+    """第 i+1 轮unescape，按需扣预算和计时"""
+    if budget is not None:
+        budget.charge(s, True)
+    if trace is None:
+        return unescape_once(s)
+    # 缓冲区版本会原地修改 s，先记下输入大小
+    size = len(s)
+    start = time.perf_counter()
+    result = None
+    try:
+        result = unescape_once(s)
+        return result
+    finally:
+        trace.add_pass(i, time.perf_counter() - start, size, 0 if result is None else len(result))
+
+
+def _unescape_to_depth(s, depth, unescape_once, budget=None, trace=None, x_escape='\\x'):
+    """直接unescape depth次，中途出错或出现 \\x 时返回None"""
+    for i in range(depth):
+        try:
+            s = _unescape_pass(s, i, unescape_once, budget, trace)
+        except UnescapeLimitExceeded:
+            raise
+        except Exception:
+            return None
+        if x_escape in s:
+            return None
+    return s
+
+
+def _validate(s, budget, trace=None):
+    if budget is not None:
+        budget.charge(s)
+    if trace is None:
+        return is_valid_json(s)
+    start = time.perf_counter()
+    ok = is_valid_json(s)
+    trace.add('validate', time.perf_counter() - start)
+    return ok
+
+
+# 一个转义序列最多吃掉反斜杠后面的字符数（\\UXXXXXXXX）
+_MAX_ESCAPE_TAIL = 9
+
+
+def _prefix_error(prefix, budget=None):
+    """prefix 后面无论接什么都不可能是合法JSON时返回True
+
+    解析出错的位置后面还有足够的字符（最长的字面量 -Infinity 为9个字符）时，出错只取决于
+    prefix 本身；未结束的字符串报告的是字符串开头的位置，不能据此判断。
+    这次完整解析和校验一样计入 budget。
+    """
+    if budget is not None:
+        budget.charge(prefix)
+    try:
+        json.loads(prefix)
+    except json.JSONDecodeError as e:
+        return e.pos + 9 < len(prefix) and not e.msg.startswith('Unterminated string')
+    except RecursionError:
+        pass
+    return False
+
+
+def _futile_reason(first, i, head, tail, tail_gap, name_escape, remaining, prefix_error=False):
+    """证明之后 remaining 轮unescape都不可能得到合法JSON时返回原因，否则返回None
+
+    first 为第一个反斜杠的位置（没有时为-1），i 为第一个非空白字符的位置；head/tail 为
+    第一个和最后一个非空白字符，tail_gap 为最后一个反斜杠到 tail 的字符数，name_escape
+    表示最后一个反斜杠之后有 N{，prefix_error 为第一个反斜杠之前的部分的 _prefix_error。
+    unescape 只改写反斜杠开始的转义序列，第一个反斜杠之前的字符永远不变；一个转义序列
+    最多吃掉反斜杠后面 _MAX_ESCAPE_TAIL 个字符，解出的反斜杠下一轮才会再往后吃，所以
+    最后一个反斜杠之后超过 remaining 倍的字符在这几轮里也不变（\\N{...} 不受此限）。
+    unicode_escape 只会把非ASCII字符换成别的非ASCII字符，不影响这里只看ASCII的判断。
+    """
+    if first == -1:
+        # 调用方已确认当前不是合法JSON；没有转义时之后每一轮都不会改变结构
+        return 'no_escapes'
+    if prefix_error:
+        return 'bad_start'
+    head_fixed = i < first
+    tail_fixed = tail_gap > _MAX_ESCAPE_TAIL * remaining and not name_escape
+    if head_fixed and head not in _VALUE_START:
+        return 'bad_start'
+    if tail_fixed and tail not in _VALUE_END:
+        return 'truncated'
+    if head_fixed and tail_fixed:
+        if head in _CLOSER:
+            ok = tail == _CLOSER[head]
+        elif head == '"':
+            ok = tail == '"'
+        elif head in '-0123456789':
+            ok = tail in '0123456789y'
+        else:
+            ok = True
+        if not ok:
+            return 'unbalanced'
+    return None
+
+
+def _futile(s, remaining, budget=None):
+    """_futile_reason 的字符串版本，只查找首尾，第一个反斜杠之前的部分解析一次"""
+    first = s.find('\\')
+    if first == -1:
+        return _futile_reason(-1, 0, '', '', 0, False, remaining)
+    last = s.rfind('\\')
+    i = 0
+    while s[i] in _WHITESPACE:
+        i += 1
+    j = len(s) - 1
+    while s[j] in _WHITESPACE:
+        j -= 1
+    return _futile_reason(first, i, s[i], s[j], j - last, s.find('N{', last) != -1, remaining,
+                          i < first and _prefix_error(s[:first], budget))
+
+
+def _multi_unescape(s, times, unescape_once, detect, validate, x_escape, budget, trace, redo=None, futile=_futile,
+                    diagnostic=None):
+    """multi_unescape 的实现，字符串和字节缓冲区共用，返回 UnescapeResult
+
+    detect 推断层数，validate 校验（签名同 _validate），x_escape 为 '\\x' 或 b'\\x'；
+    unescape_once 会原地修改缓冲区时，redo(i) 重新得到第 i 轮的结果，用于指定次数时
+    第 i+1 轮出错后返回上一轮的结果。自动模式在第一轮之前和每一轮校验失败后用
+    futile(s, 剩余轮数, budget) 检查是否已经不可能得到合法JSON，是则立即停止并返回原输入。
+    diagnostic 不为None时，出错或出现 \\x 而停止时用一条消息调用它。
+    """
+    if budget is not None:
+        budget.check_input(s)
+    if times is None:
+        depth = detect(s)
+        if depth and depth <= MAX_AUTO_TIMES:
+            # 第一个引号前有反斜杠，输入本身不可能是合法JSON，直接转到检测出的层数
+            reason = futile(s, MAX_AUTO_TIMES, budget)
+            if reason is None:
+                result = _unescape_to_depth(s, depth, unescape_once, budget, trace, x_escape)
+                if result is not None and validate(result, budget, trace):
+                    if trace is not None:
+                        trace.finish('detected', 'valid_json')
+                    return UnescapeResult(result, depth, 'valid_json', True)
+        elif validate(s, budget, trace):
+            if trace is not None:
+                trace.finish('already_valid', 'valid_json')
+            return UnescapeResult(s, 0, 'valid_json', True)
+        else:
+            reason = futile(s, MAX_AUTO_TIMES, budget)
+        # 检测失败，退回逐层尝试
+        temp = s
+        stop = 'max_passes'
+        for i in range(MAX_AUTO_TIMES):
+            if reason is not None:
+                stop = reason
+                break
+            try:
+                s_new = _unescape_pass(s, i, unescape_once, budget, trace)
+            except UnescapeLimitExceeded:
+                raise
+            except Exception as e:
+                if diagnostic is not None:
+                    diagnostic(f"Exception occurred at unescape #{i+1}: {e}, stop converting.")
+                stop = 'exception'
+                break
+            if x_escape in s_new:
+                if diagnostic is not None:
+                    diagnostic(f"Found \\x escape after unescape #{i+1}, stop converting.")
+                stop = 'x_escape'
+                break
+            s = s_new
+            if validate(s, budget, trace):
+                if trace is not None:
+                    trace.finish('fallback', 'valid_json')
+                return UnescapeResult(s, i + 1, 'valid_json', True)
+            reason = futile(s, MAX_AUTO_TIMES - i - 1, budget)
+        if trace is not None:
+            trace.finish('unresolved', stop)
+        return UnescapeResult(temp, 0, stop, False)
+    else:
+        if validate(s, budget, trace):
+            if trace is not None:
+                trace.finish('fixed_times', 'valid_json')
+            return UnescapeResult(s, 0, 'valid_json', True)
+        stop = 'times_reached'
+        passes = times
+        for i in range(times):
+            try:
+                s_new = _unescape_pass(s, i, unescape_once, budget, trace)
+            except UnescapeLimitExceeded:
+                raise
+            except Exception as e:
+                if diagnostic is not None:
+                    diagnostic(f"Exception occurred at unescape #{i+1}: {e}, stop converting.")
+                stop = 'exception'
+                passes = i
+                if redo is not None:
+                    s = redo(i)
+                break
+            s = s_new
+        if trace is not None:
+            trace.finish('fixed_times', stop)
+        # 指定次数时最后一轮之后不再校验
+        return UnescapeResult(s, passes, stop, None)
+
+
+def multi_unescape(s, times=None, engine=DEFAULT_ENGINE, budget=None, trace=None, diagnostic=None):
+    """多次unescape字符串，支持自动检测合法JSON
+
+    engine 为 ENGINES 中的名称，决定每一次unescape的实现；budget 为 UnescapeBudget，
+    在每次unescape和完整解析前检查，超出时抛出 UnescapeLimitExceeded；
+    trace 为 UnescapeTrace 时记录各阶段耗时和自动检测结果；diagnostic 见 unescape。
+    需要轮数和停止原因时用 unescape。
+    """
+    return _multi_unescape(s, times, ENGINES[engine], detect_escape_depth, _validate, '\\x', budget, trace,
+                           diagnostic=diagnostic).text
+
+
+# unicode_to_chinese_only 可限定的码位范围
+UNICODE_RANGES = {
+    'cjk': (
+        (0x2E80, 0x2FDF),    # 部首
+        (0x3000, 0x303F),    # 中日韩符号和标点
+        (0x3400, 0x4DBF),    # 扩展A
+        (0x4E00, 0x9FFF),    # 基本汉字
+        (0xF900, 0xFAFF),    # 兼容汉字
+        (0xFE30, 0xFE4F),    # 兼容形式
+        (0xFF00, 0xFFEF),    # 全角字符
+        (0x20000, 0x2FA1F),  # 扩展B-F及兼容补充
+        (0x30000, 0x3134F),  # 扩展G
+    ),
+}
+
+
+@lru_cache(maxsize=None)
+def _range_table(name):
+    """预先算好的码位表，table[码位] 为1表示需要转换"""
+    table = bytearray(0x110000)
+    for lo, hi in UNICODE_RANGES[name]:
+        table[lo:hi + 1] = b'\x01' * (hi - lo + 1)
+    return table
+
+
+def _convert_u_run(run, table):
+    """整段解码一串 \\uXXXX，落单的代理和范围外的字符保留原来的转义"""
+    text = scanstring(run + '"', 0, False)[0]
+    if table is None and not _SURROGATE_RE.search(text):
+        return text
+    parts = []
+    i = 0
+    for ch in text:
+        cp = ord(ch)
+        # 代理对合并出的字符对应两个转义
+        width = 12 if cp > 0xFFFF else 6
+        if 0xD800 <= cp <= 0xDFFF or (table is not None and not table[cp]):
+            parts.append(run[i:i + width])
+        else:
+            parts.append(ch)
+        i += width
+    return ''.join(parts)
+
+
+def unicode_to_chinese_only(s, ranges=None):
+    """将Unicode编码转换为中文字符
+
+    连续的 \\uXXXX 整段解码，代理对（emoji、扩展B汉字）合并成一个字符，
+    落单的代理保持原样；ranges 为 UNICODE_RANGES 中的名称时只转换该范围内的字符。
+    """
+    if '\\u' not in s:
+        return s
+    table = None if ranges is None else _range_table(ranges)
+    return _U_RUN_RE.sub(lambda m: _convert_u_run(m.group(), table), s)
+
+
+def find_escaped_json(s, budget=None):
+    """一次扫描找出混在日志行里的被转义JSON，返回 [(start, end, depth), ...]
+
+    从后面紧跟带反斜杠引号的括号处开始，按开头引号的反斜杠数确定层数 k，之后只有
+    恰好 2^k-1 个反斜杠的引号才切换字符串状态，字符串外的括号配平即为结束。
+    引号反斜杠数相同、当前是否在字符串里也相同的开头，之后的状态完全一致，共用一个
+    括号栈（每种层数最多两个栈），所以整个输入只扫描一遍。最后从左到右取能配平的开头，
+    和已经取到的片段重叠的跳过。budget 为 UnescapeBudget 时每 SCAN_CHECK_TOKENS 个记号
+    检查一次是否取消或超时。
+    """
+    closed = []
+    # 每组为 [引号的反斜杠数, 是否在字符串里, 括号栈]，栈中片段开头记为 (位置, 层数)，其它为None
+    groups = []
+    # 只隔着空白的一串左括号：第一个的位置和个数，片段从这串的第一个括号开始
+    bracket_run = (0, 0)
+    last_end = -1
+    countdown = SCAN_CHECK_TOKENS
+    for tok in _SPAN_TOKEN_RE.finditer(s):
+        if budget is not None:
+            countdown -= 1
+            if not countdown:
+                budget.check()
+                countdown = SCAN_CHECK_TOKENS
+        run = tok.group(1)
+        if run is not None:
+            for group in groups:
+                if len(run) == group[0]:
+                    group[1] = not group[1]
+            continue
+        if tok.group() in '{[':
+            if tok.start() == last_end or s[last_end:tok.start()].isspace():
+                bracket_run = (bracket_run[0], bracket_run[1] + 1)
+            else:
+                bracket_run = (tok.start(), 1)
+            last_end = tok.end()
+            start_run = tok.group(2)
+            depth = _depth_from_run(len(start_run)) if start_run is not None else None
+            quote_run = (1 << depth) - 1 if depth else None
+            owner = None
+            for group in groups:
+                if not group[1]:
+                    group[2].append(None)
+                    if group[0] == quote_run:
+                        owner = group
+            first, count = bracket_run
+            if owner is not None:
+                owner[2][-count] = (first, depth)
+            elif depth:
+                groups.append([quote_run, False, [(first, depth)] + [None] * (count - 1)])
+        elif groups:
+            for group in groups:
+                if not group[1]:
+                    frame = group[2].pop()
+                    if frame is not None:
+                        closed.append((frame[0], tok.end(), frame[1]))
+            groups = [group for group in groups if group[2]]
+    closed.sort()
+    spans = []
+    last = 0
+    for span in closed:
+        if span[0] >= last:
+            spans.append(span)
+            last = span[1]
+    return spans
+
+
+def _unescape_embedded(s, times, engine, budget, trace, convert=None):
+    """unescape_embedded 的实现，返回 UnescapeResult，passes 为替换掉的各片段轮数之和
+
+    stop 在所有片段都是合法JSON时为 valid_json，有片段不合法时为 invalid_span，没有找到片段时为 no_spans。
+    convert 为转换Unicode的函数时逐段转换（\\u 串不会跨过片段首尾的括号，结果和整行转换一样），
+    转换后变了的片段重新校验，valid 反映转换后的片段。
+    """
+    unescape_once = ENGINES[engine]
+    if budget is not None:
+        budget.check_input(s)
+        budget.charge(s)
+    parts = []
+    last = 0
+    passes = 0
+    stop = 'no_spans'
+    converted_valid = True
+    if trace is None:
+        spans = find_escaped_json(s, budget)
+    else:
+        start = time.perf_counter()
+        spans = find_escaped_json(s, budget)
+        trace.add('extract_scan', time.perf_counter() - start)
+    for start, end, depth in spans:
+        depth = depth if times is None else times
+        result = _unescape_to_depth(s[start:end], depth, unescape_once, budget, trace)
+        if result is not None and _validate(result, budget, trace):
+            if convert is None:
+                parts.append(s[last:start])
+            else:
+                parts.append(convert(s[last:start]))
+                converted = convert(result)
+                if converted != result and not _validate(converted, budget, trace):
+                    converted_valid = False
+                result = converted
+            parts.append(result)
+            last = end
+            passes += depth
+            if stop == 'no_spans':
+                stop = 'valid_json'
+            if trace is not None:
+                trace.finish('extracted', 'valid_json')
+        else:
+            stop = 'invalid_span'
+            if trace is not None:
+                trace.finish('unresolved', 'invalid_span')
+    if parts:
+        parts.append(s[last:] if convert is None else convert(s[last:]))
+        s = ''.join(parts)
+    elif convert is not None:
+        s = convert(s)
+    return UnescapeResult(s, passes, stop, stop == 'valid_json' and converted_valid)
+
+
+def unescape_embedded(s, times=None, engine=DEFAULT_ENGINE, budget=None, trace=None):
+    """只unescape行内被转义的JSON片段，其余文本保持原样
+
+    times 为None时每个片段按检测到的层数处理；处理后不是合法JSON的片段保持原样。
+    """
+    return _unescape_embedded(s, times, engine, budget, trace).text
+
+
+def unescape(text, times=None, engine=DEFAULT_ENGINE, convert_unicode=False, extract=False, unicode_range=None,
+             budget=None, trace=None, diagnostic=None):
+    """处理一条输入，返回 UnescapeResult，命令行、Web和交互式版本都经过这里
+
+    extract 为True时只处理内嵌的JSON片段（见 unescape_embedded），否则见 multi_unescape；
+    convert_unicode 为True时再把 \\uXXXX 转成字符（unicode_range 见 unicode_to_chinese_only）。
+    diagnostic 为接收一条消息的可调用对象（如 print 或 logger.warning），某一轮出错或出现
+    \\x 而停止时调用；不传时不生成消息，停止原因只体现在结果的 stop 中。
+    结果的 valid 针对转换之后的文本：转换改变了文本时重新校验（\\u0022、\\\\u4e2d 之类会破坏JSON）。
+    """
+    convert = None
+    if convert_unicode:
+        def convert(s):
+            return _convert_unicode(s, unicode_range, budget, trace)
+    if extract:
+        return _unescape_embedded(text, times, engine, budget, trace, convert)
+    result = _multi_unescape(text, times, ENGINES[engine], detect_escape_depth, _validate, '\\x', budget, trace,
+                             diagnostic=diagnostic)
+    if convert is not None:
+        converted = convert(result.text)
+        if converted != result.text:
+            valid = None if result.valid is None else _validate(converted, budget, trace)
+            result = result._replace(text=converted, valid=valid)
+    return result
+
+
+def _convert_unicode(s, unicode_range, budget, trace):
+    """unescape 中的Unicode转换，计入处理预算和 trace 的 unicode 阶段"""
+    if '\\u' not in s:
+        return s
+    if budget is not None:
+        budget.charge(s)
+    if trace is None:
+        return unicode_to_chinese_only(s, unicode_range)
+    start = time.perf_counter()
+    s = unicode_to_chinese_only(s, unicode_range)
+    trace.add('unicode', time.perf_counter() - start)
+    return s
+
+
+def unescape_iter(texts, times=None, engine=DEFAULT_ENGINE, convert_unicode=False, extract=False, unicode_range=None,
+                  budget=None, trace=None, diagnostic=None):
+    """逐条处理，按需产出 UnescapeResult，不会把输入读进内存
+
+    每一项是一条完整的输入，原样处理；处理文件的各行请用 unescape_lines（去掉行尾换行、跳过空行）。
+    budget 对所有输入累计生效，其余参数见 unescape。
+    """
+    for text in texts:
+        yield unescape(text, times, engine, convert_unicode, extract, unicode_range, budget, trace, diagnostic)
+
+
+def _unescape_chunk(texts, options, collect):
+    """unescape_many 在子进程中处理一块，collect 为True时把诊断消息一起带回"""
+    messages = []
+    results = list(unescape_iter(texts, diagnostic=messages.append if collect else None, **options))
+    return results, messages
+
+
+def unescape_many(texts, workers=None, times=None, engine=DEFAULT_ENGINE, convert_unicode=False, extract=False,
+                  unicode_range=None, diagnostic=None, chunk_size=MANY_CHUNK_ITEMS, executor=None):
+    """批量处理，返回和 texts 顺序一致的 UnescapeResult 列表
+
+    workers 大于1时按每块 chunk_size 条分给进程池，诊断消息在子进程中收集、回到当前进程
+    后按块的顺序交给 diagnostic；条目不足两块时直接在当前进程处理，省去启动进程的开销。
+    executor 可传入已有的 concurrent.futures 执行器代替每次新建进程池。其余参数见 unescape。
+    """
+    texts = list(texts)
+    options = dict(times=times, engine=engine, convert_unicode=convert_unicode, extract=extract,
+                   unicode_range=unicode_range)
+    if executor is None and (not workers or workers <= 1 or len(texts) < 2 * chunk_size):
+        return list(unescape_iter(texts, diagnostic=diagnostic, **options))
+    chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+    args = (chunks, [options] * len(chunks), [diagnostic is not None] * len(chunks))
+    if executor is None:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            outcomes = list(pool.map(_unescape_chunk, *args))
+    else:
+        outcomes = executor.map(_unescape_chunk, *args)
+    results = []
+    for chunk_results, messages in outcomes:
+        if diagnostic is not None:
+            for message in messages:
+                diagnostic(message)
+        results.extend(chunk_results)
+    return results
+
+
+def unescape_lines(lines, times=None, engine=DEFAULT_ENGINE, convert_unicode=False, extract=False,
+                   unicode_range=None, budget=None, trace=None):
+    """逐行unescape，每行单独检测层数，按需产出结果（不含换行符）
+
+    lines 可以是文件对象等任意可迭代对象，不会把整个输入读进内存。
+    extract 为True时只处理行内被转义的JSON片段，unicode_range 见 unicode_to_chinese_only；
+    budget 对整个输入生效，单行大小受 max_input_bytes 限制；trace 累计所有行的耗时。
+    """
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if line.strip():
+            line = unescape(line, times, engine, convert_unicode, extract, unicode_range, budget, trace).text
+        yield line
+
+
+# 缓冲区流水线每次转换的块大小
+BUFFER_CHUNK_BYTES = 1024 * 1024
+
+# 以下为字节版本的正则，用于 bytes、bytearray、mmap、memoryview
+_QUOTE_RUN_RE_B = re.compile(rb'(\\*)"')
+_U_ESCAPE_RE_B = re.compile(rb'(\\+)u[0-9a-fA-F]{4}')
+_U_RUN_START_RE_B = re.compile(rb'\\u[0-9a-fA-F]{4}')
+# surrogatepass 编码的代理
+_SURROGATE_RE_B = re.compile(b'\xed[\xa0-\xbf]')
+_BACKSLASH_RE_B = re.compile(rb'\\')
+_NAME_ESCAPE_RE_B = re.compile(rb'N\{')
+_WHITESPACE_B = _WHITESPACE.encode()
+_HIGH_SURROGATE_ESCAPE_RE_B = re.compile(rb'\\u[dD][89abAB][0-9a-fA-F]{2}')
+_BACKSLASH = ord('\\')
+# 最后一个反斜杠之后有这么多字节时，它开始的转义（最长的 \\N{...} 也不到100个字符）
+# 一定已经结束，可以在后面的普通文本中切开
+_SAFE_TAIL_BYTES = 256
+
+# 不建出对象的JSON扫描用的正则。re 每重复一次带分组的模式都要占用几十到几百字节的栈，
+# 所以转义和成串的标量都限定了重复次数，超出时回到 Python 循环里接着匹配
+_WS_RE_B = re.compile(rb'[ \t\n\r]*')
+_STR_CHARS_B = rb'[^"\\\x00-\x1f]*'
+_STR_ESCAPE_B = rb'\\(?:["\\/bfnrt]|u[0-9a-fA-F]{4})'
+_STR_CHARS_RE_B = re.compile(_STR_CHARS_B)
+_STR_ESCAPES_RE_B = re.compile(rb'(?:%s%s){1,1024}' % (_STR_ESCAPE_B, _STR_CHARS_B))
+# json.loads 也接受 NaN、Infinity、-Infinity
+_LITERAL_B = rb'-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?(?:[eE][-+]?[0-9]+)?|true|false|null|NaN|-?Infinity'
+_LITERAL_RE_B = re.compile(_LITERAL_B)
+# 转义不多的短字符串，成串匹配时用
+_SHORT_STR_B = rb'"%s(?:%s%s){0,256}"' % (_STR_CHARS_B, _STR_ESCAPE_B, _STR_CHARS_B)
+
+
+def _small_container_b(value):
+    """元素为 value、最多 64 个元素的数组或对象（正则）"""
+    ws = rb'[ \t\n\r]*'
+    member = rb'%s%s:%s(?:%s)%s' % (_SHORT_STR_B, ws, ws, value, ws)
+    element = rb'(?:%s)%s' % (value, ws)
+    return rb'\[%s(?:%s(?:,%s%s){0,63})?\]|\{%s(?:%s(?:,%s%s){0,63})?\}' % (
+        ws, element, ws, element, ws, member, ws, member)
+
+
+# 嵌套不超过三层的小容器和标量，一次匹配整个吃掉；更深或更大的回到 Python 循环里逐层处理
+_SCALAR_B = rb'%s|%s' % (_SHORT_STR_B, _LITERAL_B)
+_SMALL_VALUE_B = _SCALAR_B
+for _ in range(3):
+    _SMALL_VALUE_B = rb'%s|%s' % (_SCALAR_B, _small_container_b(_SMALL_VALUE_B))
+_SMALL_VALUE_RE_B = re.compile(_SMALL_VALUE_B)
+# 数组里一串 “值,” 和对象里一串 “"键": 值,”，一次匹配吃掉，之后的空白也一起跳过；
+# 数组先试只有数字的一串，比通用的快一倍多
+_NUMBER_RUN_RE_B = re.compile(rb'(?:[ \t\n\r]*-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?(?:[eE][-+]?[0-9]+)?[ \t\n\r]*,){0,1024}')
+_ARRAY_RUN_RE_B = re.compile(rb'(?:[ \t\n\r]*(?:%s)[ \t\n\r]*,){0,64}[ \t\n\r]*' % _SMALL_VALUE_B)
+_OBJECT_RUN_RE_B = re.compile(rb'(?:[ \t\n\r]*%s[ \t\n\r]*:[ \t\n\r]*(?:%s)[ \t\n\r]*,){0,64}[ \t\n\r]*'
+                              % (_SHORT_STR_B, _SMALL_VALUE_B))
+_QUOTE = ord('"')
+_COMMA = ord(',')
+_COLON = ord(':')
+_LBRACE, _RBRACE = ord('{'), ord('}')
+_LBRACKET, _RBRACKET = ord('['), ord(']')
+
+
+def _safe_cut(chunk):
+    """chunk 中最后一个可以切开的位置，找不到时返回None
+
+    转义序列除开头外不含反斜杠，所以在一串反斜杠的开头切开时前面的转义都已结束；
+    前面紧挨着高位代理的 \\uD800-\\uDBFF 时不切，代理对不会被分到两块。
+    最后一个反斜杠之后还有 _SAFE_TAIL_BYTES 以上的字节时（包括没有反斜杠），在最后一个
+    UTF-8字符的开头切开。
+    """
+    k = chunk.rfind(b'\\')
+    if k < len(chunk) - _SAFE_TAIL_BYTES:
+        cut = len(chunk) - 1
+        while cut > 0 and chunk[cut] & 0xC0 == 0x80:
+            cut -= 1
+        return cut or None
+    while k > 0:
+        start = k
+        while start > 0 and chunk[start - 1] == _BACKSLASH:
+            start -= 1
+        if start > 0 and (start < 6 or not _HIGH_SURROGATE_ESCAPE_RE_B.fullmatch(chunk, start - 6, start)):
+            return start
+        k = chunk.rfind(b'\\', 0, start)
+    return None
+
+
+def _rewrite_buffer(data, convert, in_place=False):
+    """按 _safe_cut 分块，用 convert(bytes) -> bytes 转换整个缓冲区
+
+    in_place 为True时 data 必须是 bytearray，结果写回 data：每块结果不长于原块时，
+    写的位置总在读的位置之前，全程只用这一个缓冲区；某块变长（unicode_escape 把
+    非ASCII字节按Latin-1解读）时，把已写出的部分复制到新的 bytearray 里继续。
+    不原地转换时结果缓冲区按输入大小一次分配好，结果不变长时不会再扩容。
+    """
+    n = len(data)
+    out = data if in_place else bytearray(n)
+    pos = written = 0
+    with memoryview(data) as view:
+        while pos < n:
+            size = BUFFER_CHUNK_BYTES
+            while True:
+                chunk = view[pos:pos + size].tobytes()
+                cut = len(chunk) if pos + len(chunk) >= n else _safe_cut(chunk)
+                if cut:
+                    break
+                size *= 2
+            piece = convert(chunk if cut == len(chunk) else chunk[:cut])
+            end = pos + cut
+            if out is data and written + len(piece) > end:
+                out = bytearray(view[:written])
+            out[written:written + len(piece)] = piece
+            written += len(piece)
+            pos = end
+    del out[written:]
+    return out
+
+
+def _unicode_escape_bytes(chunk):
+    # 字符串版本 bytes(s, "utf-8") 遇到代理会出错，保持一致
+    if _SURROGATE_RE_B.search(chunk):
+        raise UnicodeError("'utf-8' codec can't encode surrogates")
+    return _join_surrogates(codecs.unicode_escape_decode(chunk)[0]).encode('utf-8')
+
+
+def _json_unescape_bytes(chunk):
+    return _json_unescape_once(chunk.decode('utf-8', 'surrogatepass')).encode('utf-8')
+
+
+# ENGINES 中各引擎对应的按块转换函数
+_BUFFER_ENGINES = {
+    'unicode_escape': _unicode_escape_bytes,
+    'json': _json_unescape_bytes,
+}
+
+
+def _detect_buffer_depth(buf):
+    """detect_escape_depth 的字节版本"""
+    m = _QUOTE_RUN_RE_B.search(buf)
+    if m:
+        return _depth_from_run(len(m.group(1)))
+    m = _U_ESCAPE_RE_B.search(buf)
+    if m:
+        return _depth_from_run(len(m.group(1)) - 1)
+    return None
+
+
+def _last_backslash(buf):
+    """缓冲区中最后一个反斜杠的位置，memoryview 没有 rfind，从后往前分块查找"""
+    end = len(buf)
+    with memoryview(buf) as view:
+        while end > 0:
+            start = max(0, end - BUFFER_CHUNK_BYTES)
+            k = view[start:end].tobytes().rfind(b'\\')
+            if k != -1:
+                return start + k
+            end = start
+    return -1
+
+
+def _futile_buffer(buf, remaining, budget=None):
+    """_futile_reason 的字节版本"""
+    m = _BACKSLASH_RE_B.search(buf)
+    if not m:
+        return _futile_reason(-1, 0, '', '', 0, False, remaining)
+    last = _last_backslash(buf)
+    i = 0
+    while buf[i] in _WHITESPACE_B:
+        i += 1
+    j = len(buf) - 1
+    while buf[j] in _WHITESPACE_B:
+        j -= 1
+    # 和字符串版本一样按字符计数：只需知道是否超过上限，最多看上限所需的字节
+    limit = _MAX_ESCAPE_TAIL * remaining
+    tail_gap = _count_chars(buf, last + 1, min(j + 1, last + 1 + 4 * (limit + 1)))
+    return _futile_reason(m.start(), i, chr(buf[i]), chr(buf[j]), tail_gap,
+                          _NAME_ESCAPE_RE_B.search(buf, last) is not None, remaining,
+                          i < m.start() and _prefix_error_buffer(buf, m.start(), budget))
+
+
+def _count_chars(buf, start, end):
+    """buf[start:end] 中UTF-8字符的个数"""
+    window = bytes(buf[start:end])
+    return len(window) - sum(1 for b in window if b & 0xC0 == 0x80)
+
+
+def _prefix_error_buffer(buf, end, budget=None):
+    """_prefix_error 的字节版本，用 _scan_json_buffer 找出错位置，不解码也不建出对象"""
+    with memoryview(buf) as view:
+        prefix = view[:end]
+        if budget is not None:
+            budget.charge(prefix)
+        pos = _scan_json_buffer(prefix)
+        prefix.release()
+    # 和 json.loads 的 e.pos + 9 < len(prefix) 一样按字符计数
+    return 0 <= pos < end and _count_chars(buf, pos, min(end, pos + 40)) > 9
+
+
+class _ScanError(Exception):
+    """_scan_json_buffer 内部用，args[0] 为出错的位置"""
+
+
+def _scan_string(buf, pos, n):
+    """从字符串开头引号之后的 pos 开始，返回结束引号之后的位置"""
+    pos = _STR_CHARS_RE_B.match(buf, pos).end()
+    while True:
+        if pos >= n:
+            # 未结束的字符串，json.loads 报告的是字符串开头，不能据此判断
+            raise _ScanError(n)
+        c = buf[pos]
+        if c == _QUOTE:
+            return pos + 1
+        m = _STR_ESCAPES_RE_B.match(buf, pos) if c == _BACKSLASH else None
+        if m is None:
+            # 控制字符或不合法的转义
+            raise _ScanError(pos)
+        pos = m.end()
+
+
+def _scan_key(buf, pos, n):
+    """跳过对象中成串的 "键": 标量, 之后，读完下一个键和冒号，返回值开始的位置"""
+    pos = _OBJECT_RUN_RE_B.match(buf, pos).end()
+    if pos >= n:
+        raise _ScanError(n)
+    if buf[pos] != _QUOTE:
+        raise _ScanError(pos)
+    pos = _WS_RE_B.match(buf, _scan_string(buf, pos + 1, n)).end()
+    if pos >= n:
+        raise _ScanError(n)
+    if buf[pos] != _COLON:
+        raise _ScanError(pos)
+    return _WS_RE_B.match(buf, pos + 1).end()
+
+
+def _scan_json_buffer(buf):
+    """按JSON语法扫描字节缓冲区，不建出任何对象，合法时返回-1，否则返回出错的位置
+
+    出错位置和 json.loads 报告的一致；在中途结束（包括未结束的字符串）或嵌套超过
+    递归上限（json.loads 此时抛出 RecursionError）时返回 len(buf)。
+    """
+    n = len(buf)
+    closers = []
+    max_depth = sys.getrecursionlimit()
+    pos = _WS_RE_B.match(buf).end()
+    try:
+        while True:
+            # 这里应该是一个值，前面的空白已经跳过
+            if pos >= n:
+                return n
+            c = buf[pos]
+            m = _SMALL_VALUE_RE_B.match(buf, pos) if c == _LBRACE or c == _LBRACKET else None
+            if m is not None:
+                pos = m.end()
+            elif c == _LBRACE or c == _LBRACKET:
+                if len(closers) >= max_depth:
+                    return n
+                closer = _RBRACE if c == _LBRACE else _RBRACKET
+                pos = _WS_RE_B.match(buf, pos + 1).end()
+                if pos < n and buf[pos] == closer:
+                    pos += 1
+                else:
+                    closers.append(closer)
+                    if closer == _RBRACE:
+                        pos = _scan_key(buf, pos, n)
+                    else:
+                        pos = _ARRAY_RUN_RE_B.match(buf, _NUMBER_RUN_RE_B.match(buf, pos).end()).end()
+                    continue
+            elif c == _QUOTE:
+                pos = _scan_string(buf, pos + 1, n)
+            else:
+                m = _LITERAL_RE_B.match(buf, pos)
+                if m is None:
+                    return pos
+                pos = m.end()
+            # 一个值结束，之后是逗号、右括号或输入结尾
+            while True:
+                pos = _WS_RE_B.match(buf, pos).end()
+                if not closers:
+                    return -1 if pos == n else pos
+                if pos >= n:
+                    return n
+                c = buf[pos]
+                if c == _COMMA:
+                    if closers[-1] == _RBRACE:
+                        pos = _scan_key(buf, pos + 1, n)
+                    else:
+                        pos = _ARRAY_RUN_RE_B.match(buf, _NUMBER_RUN_RE_B.match(buf, pos + 1).end()).end()
+                    break
+                if c != closers[-1]:
+                    return pos
+                closers.pop()
+                pos += 1
+    except _ScanError as e:
+        return e.args[0]
+
+
+def buffer_is_valid_json(buf):
+    """检查UTF-8字节缓冲区是否为有效的JSON，结果和 is_valid_json 相同
+
+    JSON的结构字符都是ASCII，非ASCII字节只能出现在字符串里，所以直接按字节扫描语法，
+    不解码、不建出任何值，除几个正则的匹配状态外不占额外内存。
+    """
+    return _scan_json_buffer(buf) == -1
+
+
+def _validate_buffer(buf, budget, trace=None):
+    if budget is not None:
+        budget.charge(buf)
+    if trace is None:
+        return buffer_is_valid_json(buf)
+    start = time.perf_counter()
+    ok = buffer_is_valid_json(buf)
+    trace.add('validate', time.perf_counter() - start)
+    return ok
+
+
+def multi_unescape_buffer(data, times=None, engine=DEFAULT_ENGINE, budget=None, trace=None, diagnostic=None):
+    """multi_unescape 的字节版本，输入输出都是UTF-8编码，结果相同
+
+    data 可以是 bytes、bytearray、mmap 或 memoryview，不会被修改；返回 data 本身或一个新的
+    bytearray。第一轮unescape写入新的 bytearray，之后各轮都在这个缓冲区里原地进行，丢弃的
+    中间层不会留在内存里；校验见 buffer_is_valid_json，不占额外内存。除输入本身外，峰值内存
+    约为最大一层结果加几块 BUFFER_CHUNK_BYTES 的临时对象；unicode_escape 引擎把非ASCII字节
+    按Latin-1读成两倍时这一轮会变长，变长的一轮要同时保留输入和输出，不超过最大一层的2倍。
+    """
+    convert = _BUFFER_ENGINES[engine]
+
+    def unescape_once(buf):
+        return _rewrite_buffer(buf, convert, in_place=buf is not data)
+
+    def redo(i):
+        buf = data
+        for _ in range(i):
+            buf = unescape_once(buf)
+        return buf
+
+    return _multi_unescape(data, times, unescape_once, _detect_buffer_depth, _validate_buffer, b'\\x',
+                           budget, trace, redo, _futile_buffer, diagnostic).text
+
+
+def unicode_to_chinese_buffer(buf, ranges=None, in_place=False):
+    """unicode_to_chinese_only 的字节版本，in_place 为True时原地转换（buf 须为 bytearray）"""
+    if not _U_RUN_START_RE_B.search(buf):
+        return buf
+
+    def convert(chunk):
+        return unicode_to_chinese_only(chunk.decode('utf-8', 'surrogatepass'), ranges).encode('utf-8', 'surrogatepass')
+
+    return _rewrite_buffer(buf, convert, in_place)
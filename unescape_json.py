@@ -1,61 +1,713 @@
 #!/usr/bin/env python3
 
+import os
 import sys
-import argparse
-import re
 import json
+import mmap
+import time
+import heapq
+import sqlite3
+import hashlib
+import argparse
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+
+import unescape_core
+from unescape_core import ENGINES, DEFAULT_ENGINE, UNICODE_RANGES, UnescapeTrace, unescape, unescape_lines
+from unescape_core import multi_unescape_buffer, unicode_to_chinese_buffer
+
+# 多进程模式下每个任务块的行数
+CHUNK_LINES = 2000
+# 内存映射按行读取时每次解码的字节数
+MMAP_BLOCK_BYTES = 1024 * 1024
+# 内存映射读取时，每处理这么多字节就让内核回收已读过的页面
+MMAP_RELEASE_BYTES = 16 * 1024 * 1024
+# 写出大结果时每次编码的字符数，避免一次性生成整份 bytes
+WRITE_CHUNK_CHARS = 1024 * 1024
+# --follow 每次最多读取的字节数
+FOLLOW_READ_BYTES = 1024 * 1024
+# --cache 的默认位置和容量（结果的UTF-8字节数）
+DEFAULT_CACHE_PATH = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'),
+                                  'unescape_json', 'results.sqlite3')
+CACHE_MAX_BYTES = 512 * 1024 * 1024
+# 短于这么多字符的行不缓存，直接处理比查库快
+CACHE_MIN_CHARS = 64
+# 等待其它进程释放写锁的秒数
+CACHE_LOCK_SECONDS = 30
+# 每条 SQL 最多带的键数（sqlite 参数个数有上限）
+CACHE_QUERY_KEYS = 500
 
 
-def is_valid_json(s):
+def open_input(input_file):
+    """打开输入文件，'-' 表示标准输入"""
+    if input_file == '-':
+        return sys.stdin
+    return open(input_file, "r", encoding="utf-8")
+
+
+def _map_file(f):
+    """只读映射整个文件，空文件返回None"""
     try:
-        json.loads(s)
-        return True
-    except Exception:
-        return False
-
-def multi_unescape(s, times=None):
-    if is_valid_json(s):
-        return s
-    if times is None:
-        temp = s
-        for i in range(10):
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except ValueError:
+        return None
+
+
+def read_mmap_text(input_file):
+    """通过内存映射读取整个文件并去掉首尾空白
+
+    直接从映射的页面解码成字符串，不会先复制一份 bytes。
+    """
+    with open(input_file, "rb") as f:
+        mm = _map_file(f)
+        if mm is None:
+            return ''
+        with mm:
+            start, end = 0, len(mm)
+            while start < end and mm[start] in b' \t\n\r':
+                start += 1
+            while end > start and mm[end - 1] in b' \t\n\r':
+                end -= 1
+            with memoryview(mm) as view:
+                return str(view[start:end], "utf-8").strip()
+
+
+def _strip_bounds(buf):
+    """和 str.strip() 一样去掉首尾空白，返回剩下部分在 buf 中的 [start, end)"""
+    start, end = 0, len(buf)
+    while start < end:
+        ch = bytes(buf[start:start + 4]).decode("utf-8", "replace")[0]
+        if not ch.isspace():
+            break
+        start += len(ch.encode("utf-8"))
+    while end > start:
+        ch = bytes(buf[max(start, end - 4):end]).decode("utf-8", "replace")[-1]
+        if not ch.isspace():
+            break
+        end -= len(ch.encode("utf-8"))
+    return start, end
+
+
+@contextmanager
+def read_buffer(input_file):
+    """把整个输入作为去掉首尾空白的只读字节缓冲区
+
+    普通文件通过内存映射读取，页面属于内核的页缓存，不占进程堆内存；
+    标准输入、管道等不能映射的输入整个读进一份 bytes。
+    """
+    if input_file == '-':
+        data = sys.stdin.buffer.read()
+        start, end = _strip_bounds(data)
+        yield memoryview(data)[start:end]
+        return
+    with open(input_file, "rb") as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            # 空文件或不支持映射的文件
+            data = f.read()
+            start, end = _strip_bounds(data)
+            yield memoryview(data)[start:end]
+            return
+        with mm:
+            start, end = _strip_bounds(mm)
+            view = memoryview(mm)[start:end]
             try:
-                s_new = bytes(s, "utf-8").decode("unicode_escape")
-            except Exception as e:
-                print(f"Exception occurred at unescape #{i+1}: {e}, stop converting.", file=sys.stderr)
-                break
-            if '\\x' in s_new:
-                print(f"Found \\x escape after unescape #{i+1}, stop converting.", file=sys.stderr)
+                yield view
+            finally:
+                view.release()
+
+
+def print_diagnostic(message):
+    print(message, file=sys.stderr)
+
+
+def unescape_file(input_file, output_file, times=None, engine=DEFAULT_ENGINE, convert_unicode=False,
+                  unicode_range=None, trace=None, diagnostic=None):
+    """整体处理一个文件：读入、unescape、转中文、写出都用字节缓冲区，不解码成字符串
+
+    峰值内存不超过最大一层结果的2倍（见 multi_unescape_buffer），通过内存映射读取的输入不计入。
+    output_file 为None时写到标准输出并补一个换行；返回 (输入字节数, 输出字节数)。
+    """
+    with read_buffer(input_file) as data:
+        result = multi_unescape_buffer(data, times, engine, trace=trace, diagnostic=diagnostic)
+        if convert_unicode:
+            start = time.perf_counter()
+            result = unicode_to_chinese_buffer(result, unicode_range, in_place=result is not data)
+            if trace is not None:
+                trace.add('unicode', time.perf_counter() - start)
+        if output_file:
+            with open(output_file, "wb") as f:
+                f.write(result)
+        else:
+            sys.stdout.flush()
+            sys.stdout.buffer.write(result)
+            sys.stdout.buffer.write(b"\n")
+            sys.stdout.buffer.flush()
+        return len(data), len(result)
+
+
+def mmap_lines(input_file):
+    """在内存映射上查找行边界，按块只把取到的行解码成字符串"""
+    with open(input_file, "rb") as f:
+        mm = _map_file(f)
+        if mm is None:
+            return
+        with mm:
+            can_release = hasattr(mm, "madvise") and hasattr(mmap, "MADV_DONTNEED")
+            pos, size, released = 0, len(mm), 0
+            while pos < size:
+                # [pos, end) 是若干完整的行，end 处是换行符或文件末尾
+                end = pos + MMAP_BLOCK_BYTES
+                if end >= size:
+                    end = size - 1 if mm[size - 1] == 0x0A else size
+                else:
+                    end = mm.rfind(b"\n", pos, end)
+                    if end == -1:
+                        end = mm.find(b"\n", pos + MMAP_BLOCK_BYTES)
+                        if end == -1:
+                            end = size
+                yield from mm[pos:end].decode("utf-8").split("\n")
+                pos = end + 1
+                if can_release and pos - released >= MMAP_RELEASE_BYTES:
+                    # 已经处理过的页面不会再读，交还给内核，RSS 不随文件增长
+                    boundary = min(pos, size) // mmap.PAGESIZE * mmap.PAGESIZE
+                    mm.madvise(mmap.MADV_DONTNEED, 0, boundary)
+                    released = boundary
+
+
+def write_text(out, text):
+    """分块写出，避免编码时一次性复制出整份结果"""
+    for i in range(0, len(text), WRITE_CHUNK_CHARS):
+        out.write(text[i:i + WRITE_CHUNK_CHARS])
+
+
+def write_record(out, result):
+    """写出一条结果和换行；含有无法编码的字符（如输入中落单的代理）时只把这些字符写成
+    \\uXXXX 转义，不让一条记录中断整个流"""
+    try:
+        out.write(result)
+    except UnicodeEncodeError:
+        out.write(result.encode('utf-8', 'backslashreplace').decode('utf-8'))
+    out.write("\n")
+
+
+def unescape_chunk(lines, options):
+    """在子进程中处理一个块，options 为 unescape_lines 的关键字参数"""
+    return list(unescape_lines(lines, **options))
+
+
+def _chunks(lines, size):
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def parallel_unescape_lines(lines, jobs, options):
+    """按块分给进程池处理，按原顺序产出结果
+
+    同时在途的块最多 2*jobs 个，读取速度不会甩开处理速度，内存占用保持平稳。
+    """
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        pending = deque()
+        for chunk in _chunks(lines, CHUNK_LINES):
+            pending.append(pool.submit(unescape_chunk, chunk, options))
+            if len(pending) >= 2 * jobs:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+class Profile:
+    """--profile 的统计：所有记录的总计，以及耗时最长的 top 条记录（top 为0时保留全部）"""
+
+    def __init__(self, top=10):
+        self.total = UnescapeTrace()
+        self.top = top
+        self.slowest = []
+        self.records = 0
+        self.seconds = 0.0
+        self.input_bytes = 0
+        self.output_bytes = 0
+
+    def add(self, index, input_size, output_size, trace, seconds):
+        self.total.merge(trace)
+        self.records += 1
+        self.seconds += seconds
+        self.input_bytes += input_size
+        self.output_bytes += output_size
+        record = {
+            'record': index,
+            'seconds': seconds,
+            'input_bytes': input_size,
+            'output_bytes': output_size,
+            'passes': trace.passes,
+            'pass_bytes': trace.pass_bytes,
+            'pass_seconds': trace.pass_seconds,
+            'stages': trace.stages,
+            'outcomes': trace.outcomes,
+            'stops': trace.stops,
+        }
+        entry = (seconds, -index, record)
+        if not self.top or len(self.slowest) < self.top:
+            heapq.heappush(self.slowest, entry)
+        elif entry > self.slowest[0]:
+            heapq.heapreplace(self.slowest, entry)
+
+    def report(self):
+        total = self.total
+        return {
+            'records': self.records,
+            'seconds': self.seconds,
+            'input_bytes': self.input_bytes,
+            'output_bytes': self.output_bytes,
+            'passes': total.passes,
+            'pass_bytes': total.pass_bytes,
+            'pass_seconds': total.pass_seconds,
+            'stages': total.stages,
+            'outcomes': total.outcomes,
+            'stops': total.stops,
+            'slowest': [record for _, _, record in sorted(self.slowest, reverse=True)],
+        }
+
+
+def _counts(counts):
+    return ', '.join(f'{name} {n}' for name, n in sorted(counts.items(), key=lambda item: -item[1])) or '-'
+
+
+def format_profile(report):
+    """把 Profile.report() 排成便于阅读的文本（按行处理时大小为字符数，整体处理时为字节数）"""
+    seconds = report['seconds'] or 1e-9
+    lines = [f"== profile: {report['records']} 条记录, {report['seconds']:.3f}s, "
+             f"输入 {report['input_bytes']} -> 输出 {report['output_bytes']}"]
+    stages = dict(report['stages'])
+    stages['other'] = max(0.0, report['seconds'] - sum(stages.values()))
+    lines.append('阶段耗时: ' + ', '.join(f'{name} {t:.3f}s ({t / seconds:.0%})' for name, t in stages.items()))
+    lines.append(f"unescape 共 {report['passes']} 轮")
+    for i, (t, (bytes_in, bytes_out)) in enumerate(zip(report['pass_seconds'], report['pass_bytes'])):
+        lines.append(f'  第{i + 1}轮: {t:.3f}s, {bytes_in} -> {bytes_out}')
+    lines.append('停止原因: ' + _counts(report['stops']))
+    lines.append('检测结果: ' + _counts(report['outcomes']))
+    if report['slowest']:
+        lines.append('最慢的记录:')
+        lines.append(f"  {'记录':>8} {'耗时':>10} {'轮数':>4} {'输入':>10} {'输出':>10}  停止原因")
+        for r in report['slowest']:
+            lines.append(f"  {r['record']:>8} {r['seconds']:>9.4f}s {r['passes']:>4} {r['input_bytes']:>10} "
+                         f"{r['output_bytes']:>10}  {_counts(r['stops'])}")
+    memory = report.get('memory')
+    if memory:
+        lines.append(f"内存峰值: {memory['peak_bytes']} 字节，分配最多的位置:")
+        for site in memory['top']:
+            lines.append(f"  {site['size']:>12}  {site['count']:>8}  {site['where']}")
+    return '\n'.join(lines) + '\n'
+
+
+def profile_lines(lines, options, profile):
+    """逐行处理，每行单独记录耗时、轮数和停止原因"""
+    for index, line in enumerate(lines, 1):
+        trace = UnescapeTrace()
+        start = time.perf_counter()
+        result = next(unescape_lines([line], trace=trace, **options))
+        if line.strip():
+            profile.add(index, len(line.rstrip('\r\n')), len(result), trace, time.perf_counter() - start)
+        yield result
+
+
+def stream_lines(input_file, output_file, options, jobs=1, use_mmap=False, profile=None, cache=None):
+    """逐行读取、逐行写出，内存占用与文件大小无关；cache 为 DiskCache 时跳过处理过的行"""
+    out = open(output_file, "w", encoding="utf-8") if output_file else sys.stdout
+    try:
+        if use_mmap:
+            _write_lines(out, mmap_lines(input_file), options, jobs, profile, cache)
+        else:
+            with open_input(input_file) as f:
+                _write_lines(out, f, options, jobs, profile, cache)
+    finally:
+        if output_file:
+            out.close()
+
+
+class LogFollower:
+    """跟踪不断追加的日志文件，每次只读取新增的字节，只交出完整的行
+
+    offset 是第一个还没交出的字节位置（总在行首），保存到检查点后重启可以接着读。
+    文件被轮转（路径指向了新文件）时先读完旧文件剩下的内容再从新文件开头读；
+    文件被截断（变得比 offset 还短）时从头开始读。
+    """
+
+    def __init__(self, path, checkpoint=None, from_end=False):
+        self.path = path
+        self.checkpoint = checkpoint
+        self.file = None
+        self.identity = None
+        self.offset = 0
+        self.pending = b''
+        self.saved = None
+        state = self._load_checkpoint()
+        if self._open():
+            if state and state.get('identity') == list(self.identity) and state['offset'] <= self._size():
+                self.offset = state['offset']
+            elif from_end:
+                self.offset = self._size()
+            self.file.seek(self.offset)
+            self.saved = (self.identity, self.offset)
+
+    def _load_checkpoint(self):
+        if not self.checkpoint or not os.path.exists(self.checkpoint):
+            return None
+        with open(self.checkpoint, encoding="utf-8") as f:
+            return json.load(f)
+
+    def save_checkpoint(self):
+        """原子地写入检查点，位置没变时不写"""
+        if not self.checkpoint or self.identity is None or self.saved == (self.identity, self.offset):
+            return
+        tmp = self.checkpoint + '.tmp'
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({'path': os.path.abspath(self.path), 'identity': list(self.identity), 'offset': self.offset}, f)
+        os.replace(tmp, self.checkpoint)
+        self.saved = (self.identity, self.offset)
+
+    def _open(self):
+        try:
+            self.file = open(self.path, "rb")
+        except FileNotFoundError:
+            return False
+        st = os.fstat(self.file.fileno())
+        self.identity = (st.st_dev, st.st_ino)
+        self.offset = 0
+        self.pending = b''
+        return True
+
+    def _size(self):
+        return os.fstat(self.file.fileno()).st_size
+
+    def _split(self, data, final=False):
+        """切出完整的行，剩下的半行留到下次；final 为True时把半行也当成一行"""
+        data = self.pending + data
+        end = len(data) if final else data.rfind(b"\n") + 1
+        self.pending = data[end:]
+        self.offset += end
+        if not end:
+            return []
+        # 和 mmap_lines 一样只按 \n 切分（splitlines 还会在 U+2028、\x1c、\f 等处切开），行尾的 \r 去掉
+        if data[end - 1] == 0x0A:
+            end -= 1
+        lines = data[:end].decode("utf-8", "replace").split("\n")
+        return [line[:-1] if line.endswith("\r") else line for line in lines]
+
+    def read_lines(self):
+        """返回自上次以来新增的完整行，没有新内容时返回空列表"""
+        if self.file is None and not self._open():
+            return []
+        data = self.file.read(FOLLOW_READ_BYTES)
+        if data:
+            return self._split(data)
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            # 轮转过程中文件暂时不存在，下次再看
+            return []
+        if (st.st_dev, st.st_ino) != self.identity:
+            # 已经轮转：读完旧文件剩下的内容，再切换到新文件
+            lines = self._split(self.file.read(), final=True)
+            self.file.close()
+            self._open()
+            return lines
+        if st.st_size < self.offset + len(self.pending):
+            # 被截断，从头读
+            self.file.seek(0)
+            self.offset = 0
+            self.pending = b''
+        return []
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+
+def follow(input_file, output_file, options, checkpoint=None, poll_interval=0.2, from_end=False, cache=None):
+    """持续跟踪日志文件，新的完整行到达后立即转义写出，空闲时只是定时检查文件大小"""
+    # 从检查点恢复时不能覆盖已有的输出
+    out = open(output_file, "a", encoding="utf-8") if output_file else sys.stdout
+    follower = LogFollower(input_file, checkpoint, from_end)
+    try:
+        while True:
+            lines = follower.read_lines()
+            if not lines:
+                time.sleep(poll_interval)
+                continue
+            if cache is not None:
+                results = cached_unescape_lines(lines, options, cache)
+            else:
+                results = unescape_lines(lines, **options)
+            for result in results:
+                write_record(out, result)
+            # 先落盘结果再保存位置，重启后不会漏行
+            out.flush()
+            follower.save_checkpoint()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        out.flush()
+        follower.save_checkpoint()
+        follower.close()
+        if output_file:
+            out.close()
+
+
+class DiskCache:
+    """跨进程共享的磁盘结果缓存（sqlite3），按行内容和处理参数的摘要查找，超过容量时淘汰最久没用过的条目
+
+    每块行只查一次库、写一次库；多个进程可以同时使用同一个缓存文件（WAL 模式，写入时加锁等待）。
+    键里包含 unescape_core.py 的摘要，升级核心代码后旧结果自动失效，不会改变输出。
+    读写出错（如磁盘满、锁等待超时）时只提示一次，之后当作未命中继续处理。
+    """
+
+    # 淘汰时删到容量的这个比例以下，避免每块都触发淘汰
+    EVICT_TO = 0.9
+
+    def __init__(self, path, max_bytes=CACHE_MAX_BYTES, min_chars=CACHE_MIN_CHARS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.min_chars = min_chars
+        self.failed = False
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.db = sqlite3.connect(path, timeout=CACHE_LOCK_SECONDS, isolation_level=None)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        with self._transaction():
+            for statement in _CACHE_SCHEMA:
+                self.db.execute(statement)
+        with open(unescape_core.__file__, 'rb') as f:
+            self.version = hashlib.blake2b(f.read(), digest_size=16).digest()
+
+    @contextmanager
+    def _transaction(self):
+        # 一开始就拿写锁，避免两个进程都从读锁升级时互相等待
+        self.db.execute('BEGIN IMMEDIATE')
+        try:
+            yield
+        except BaseException:
+            self.db.execute('ROLLBACK')
+            raise
+        self.db.execute('COMMIT')
+
+    def _warn(self, error):
+        if not self.failed:
+            print(f"缓存 {self.path} 读写失败，继续不使用缓存: {error}\n"
+                  f"Cache {self.path} failed, continuing without it: {error}", file=sys.stderr)
+        self.failed = True
+
+    def keys(self, lines, options):
+        """每行的缓存键，太短的行返回 None（直接处理比查库快）"""
+        prefix = hashlib.blake2b(digest_size=20)
+        prefix.update(self.version)
+        prefix.update(repr(sorted(options.items())).encode('utf-8'))
+        keys = []
+        for line in lines:
+            line = line.rstrip('\r\n')
+            if len(line) < self.min_chars:
+                keys.append(None)
+                continue
+            h = prefix.copy()
+            h.update(line.encode('utf-8', 'surrogatepass'))
+            keys.append(h.digest())
+        return keys
+
+    def get_many(self, keys):
+        """查出已缓存的结果，返回 {键: 结果}"""
+        keys = [key for key in keys if key is not None]
+        found = {}
+        if self.failed:
+            return found
+        try:
+            for i in range(0, len(keys), CACHE_QUERY_KEYS):
+                batch = keys[i:i + CACHE_QUERY_KEYS]
+                query = f"SELECT key, value FROM entries WHERE key IN ({','.join('?' * len(batch))})"
+                found.update(self.db.execute(query, batch))
+        except sqlite3.Error as e:
+            self._warn(e)
+        return found
+
+    def update(self, hit_keys, new_items):
+        """在一个事务里写入新结果、刷新命中条目的使用时间、累加命中数，必要时淘汰"""
+        if self.failed:
+            return
+        now = time.time()
+        try:
+            with self._transaction():
+                # 键相同结果必然相同，别的进程已经写入时保留它的
+                self.db.executemany('INSERT OR IGNORE INTO entries (key, value) VALUES (?, ?)', new_items)
+                self.db.executemany('INSERT OR REPLACE INTO usage (key, used) VALUES (?, ?)',
+                                    [(key, now) for key, _ in new_items])
+                # 命中的条目可能在查询之后已被别的进程淘汰，只刷新还在的，不留下没有条目的使用记录
+                self.db.executemany('UPDATE usage SET used = ? WHERE key = ? AND key IN (SELECT key FROM entries)',
+                                    [(now, key) for key in hit_keys])
+                self.db.execute("UPDATE meta SET value = value + ? WHERE name = 'hits'", (len(hit_keys),))
+                self.db.execute("UPDATE meta SET value = value + ? WHERE name = 'misses'", (len(new_items),))
+                if self._meta('bytes') > self.max_bytes:
+                    self._evict()
+        except sqlite3.Error as e:
+            self._warn(e)
+
+    def _meta(self, name):
+        return self.db.execute('SELECT value FROM meta WHERE name = ?', (name,)).fetchone()[0]
+
+    def _evict(self):
+        """按最久没用过的顺序淘汰，删到总字节数刚好不超过 EVICT_TO 为止"""
+        # 旧版本留下的没有条目的使用记录排在最前面，不清掉会挡住真正该淘汰的条目
+        self.db.execute('DELETE FROM usage WHERE key NOT IN (SELECT key FROM entries)')
+        excess = self._meta('bytes') - self.max_bytes * self.EVICT_TO
+        keys = []
+        rows = self.db.execute('SELECT usage.key, length(CAST(entries.value AS BLOB)) FROM usage '
+                               'JOIN entries ON entries.key = usage.key ORDER BY usage.used')
+        for key, size in rows:
+            if excess <= 0:
                 break
-            s = s_new
-            if is_valid_json(s):
-                return s
-        return temp
+            keys.append(key)
+            excess -= size
+        rows.close()
+        for i in range(0, len(keys), CACHE_QUERY_KEYS):
+            batch = keys[i:i + CACHE_QUERY_KEYS]
+            deleted = self.db.execute(f"DELETE FROM entries WHERE key IN ({','.join('?' * len(batch))})",
+                                      batch).rowcount
+            self.db.execute("UPDATE meta SET value = value + ? WHERE name = 'evictions'", (deleted,))
+
+    def stats(self):
+        """缓存文件里的条目数、结果总字节数和累计的命中、未命中、淘汰数"""
+        stats = dict(self.db.execute('SELECT name, value FROM meta'))
+        stats['entries'] = self.db.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+        stats['file_bytes'] = sum(os.path.getsize(self.path + suffix) for suffix in ('', '-wal')
+                                  if os.path.exists(self.path + suffix))
+        return stats
+
+    def close(self):
+        self.db.close()
+
+
+# 最近使用时间单独放一张窄表，命中时只改这张表，不用重写整条结果
+# 结果的UTF-8字节总数由触发器维护，多个进程同时写入也不会算错
+_CACHE_SCHEMA = [
+    'CREATE TABLE IF NOT EXISTS entries (key BLOB PRIMARY KEY, value TEXT NOT NULL)',
+    'CREATE TABLE IF NOT EXISTS usage (key BLOB PRIMARY KEY, used REAL NOT NULL) WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS usage_used ON usage (used)',
+    'CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)',
+    "INSERT OR IGNORE INTO meta VALUES ('bytes', 0), ('hits', 0), ('misses', 0), ('evictions', 0)",
+    'CREATE TRIGGER IF NOT EXISTS entries_insert AFTER INSERT ON entries BEGIN '
+    "UPDATE meta SET value = value + length(CAST(NEW.value AS BLOB)) WHERE name = 'bytes'; END",
+    'CREATE TRIGGER IF NOT EXISTS entries_delete AFTER DELETE ON entries BEGIN '
+    "UPDATE meta SET value = value - length(CAST(OLD.value AS BLOB)) WHERE name = 'bytes'; "
+    'DELETE FROM usage WHERE key = OLD.key; END',
+]
+
+
+def cached_unescape_lines(lines, options, cache, jobs=1):
+    """按块查缓存，只处理没命中的行，按原顺序产出结果；jobs 大于1时未命中的行交给进程池"""
+    def lookups():
+        for chunk in _chunks(lines, CHUNK_LINES):
+            keys = cache.keys(chunk, options)
+            found = cache.get_many(keys)
+            misses = [line for line, key in zip(chunk, keys) if key not in found]
+            yield keys, found, misses
+
+    def merge(keys, found, results):
+        hits, new_items = [], []
+        results = iter(results)
+        for key in keys:
+            if key is not None and key in found:
+                value = found[key]
+                hits.append(key)
+            else:
+                value = next(results)
+                if key is not None:
+                    new_items.append((key, value))
+            yield value
+        cache.update(hits, new_items)
+
+    if jobs <= 1:
+        for keys, found, misses in lookups():
+            yield from merge(keys, found, unescape_lines(misses, **options))
+        return
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        pending = deque()
+        for keys, found, misses in lookups():
+            pending.append((keys, found, pool.submit(unescape_chunk, misses, options)))
+            if len(pending) >= 2 * jobs:
+                keys, found, future = pending.popleft()
+                yield from merge(keys, found, future.result())
+        while pending:
+            keys, found, future = pending.popleft()
+            yield from merge(keys, found, future.result())
+
+
+def _write_lines(out, lines, options, jobs, profile=None, cache=None):
+    if profile is not None:
+        results = profile_lines(lines, options, profile)
+    elif cache is not None:
+        results = cached_unescape_lines(lines, options, cache, jobs)
+    elif jobs > 1:
+        results = parallel_unescape_lines(lines, jobs, options)
     else:
-        for i in range(times):
-            try:
-                s_new = bytes(s, "utf-8").decode("unicode_escape")
-            except Exception as e:
-                print(f"Exception occurred at unescape #{i+1}: {e}, stop converting.", file=sys.stderr)
-                break
-            s = s_new
-        return s
+        results = unescape_lines(lines, **options)
+    for result in results:
+        write_record(out, result)
 
-def unicode_to_chinese_only(s):
-    def repl(match):
-        return chr(int(match.group(1), 16))
-    return re.sub(r'\\u([0-9a-fA-F]{4})', repl, s)
 
-if __name__ == "__main__":
+def cache_stats(argv):
+    """cache-stats 子命令：显示缓存文件的条目数、大小和累计命中情况"""
+    parser = argparse.ArgumentParser(
+        prog='unescape_json.py cache-stats',
+        description="显示 --cache 结果缓存的统计\nShow statistics of the --cache result cache",
+        formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument('--cache', metavar='FILE', default=DEFAULT_CACHE_PATH,
+                        help='缓存文件（默认 %(default)s）\nCache file (default: %(default)s)')
+    args = parser.parse_args(argv)
+    if not os.path.exists(args.cache):
+        print(f"缓存文件不存在 (Cache file not found): {args.cache}", file=sys.stderr)
+        sys.exit(1)
+    cache = DiskCache(args.cache)
+    try:
+        stats = cache.stats()
+    finally:
+        cache.close()
+    lookups = stats['hits'] + stats['misses']
+    print(f"缓存文件 (file): {args.cache}, {stats['file_bytes']} 字节 (bytes)")
+    print(f"条目 (entries): {stats['entries']}, 结果 (results): {stats['bytes']} 字节 (bytes)")
+    print(f"命中 (hits): {stats['hits']}, 未命中 (misses): {stats['misses']}, "
+          f"命中率 (hit ratio): {stats['hits'] / lookups if lookups else 0:.1%}")
+    print(f"淘汰 (evictions): {stats['evictions']}")
+
+
+def main():
+    if sys.argv[1:2] == ['cache-stats']:
+        cache_stats(sys.argv[2:])
+        return
     parser = argparse.ArgumentParser(
         description="多次 unescape json 字符串（支持自动检测合法json）\n"
                     "Unescape json string multiple times (auto stop if valid json detected)",
         epilog="示例 Example:\n"
                "  python3 unescape_json.py input.txt -n 2 -o out.txt\n"
-               "  python3 unescape_json.py input.txt -zh",
+               "  python3 unescape_json.py input.txt -zh\n"
+               "  python3 unescape_json.py input.txt --engine json\n"
+               "  python3 unescape_json.py app.log --lines -zh -o out.log\n"
+               "  python3 unescape_json.py app.log --jobs 8 -o out.log\n"
+               "  python3 unescape_json.py app.log --lines --extract\n"
+               "  python3 unescape_json.py app.log --follow --checkpoint app.log.ckpt -o out.log\n"
+               "  python3 unescape_json.py app.log --lines --cache -o out.log\n"
+               "  python3 unescape_json.py cache-stats\n"
+               "  python3 unescape_json.py app.log --lines --profile --profile-format json --profile-output prof.json",
         formatter_class=argparse.RawTextHelpFormatter
     )
-    parser.add_argument('input', nargs='?', help='输入文件名 (Input file name)')
+    parser.add_argument('input', nargs='?', help='输入文件名，- 表示标准输入 (Input file name, - for stdin)')
     parser.add_argument('-i', '--input_opt', help='输入文件名 (Input file name, 可选参数名)')
     parser.add_argument('-n', '--number', type=int,
                         help='unescape 次数（可选，不指定则自动最多10次，遇到合法json即停止）\n'
@@ -64,6 +716,65 @@ if __name__ == "__main__":
                         help='输出文件名（可选）(Output file name, optional)')
     parser.add_argument('-zh', action='store_true',
                         help='unescape 后再进行 unicode 转中文 (Convert unicode to Chinese after unescape)')
+    parser.add_argument('--zh-range', choices=sorted(UNICODE_RANGES),
+                        help='配合 -zh，只转换指定范围内的字符（如 cjk），其余 \\uXXXX 保持原样\n'
+                             'With -zh, only convert characters in this range (e.g. cjk), keep other \\uXXXX as is')
+    parser.add_argument('--engine', choices=sorted(ENGINES), default=DEFAULT_ENGINE,
+                        help='unescape 引擎：json 按JSON字符串规则解码，不会弄乱已有中文（默认 %(default)s）\n'
+                             'Unescape engine: json decodes JSON string escapes and keeps existing CJK text (default: %(default)s)')
+    parser.add_argument('--lines', action='store_true',
+                        help='按行流式处理（NDJSON/日志），每行单独unescape并立即输出\n'
+                             'Stream line by line (NDJSON/logs), each line unescaped and written on its own')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='多进程并行处理的进程数，大于1时按行处理（隐含 --lines），输出保持原顺序\n'
+                             'Number of worker processes; above 1 input is processed line by line (implies --lines), output keeps input order')
+    parser.add_argument('--mmap', action='store_true',
+                        help='按行处理或 --extract 时用内存映射读取输入文件，适合超大文件（不能用于标准输入；'
+                             '整体处理时总是映射读取）\n'
+                             'With --lines or --extract, read the input file through mmap, for very large files '
+                             '(not for stdin; whole-file mode always maps the file)')
+    parser.add_argument('--extract', action='store_true',
+                        help='只unescape混在日志文本中的被转义JSON片段，其余文本保持原样\n'
+                             'Only unescape escaped JSON spans embedded in log text, leave the rest as is')
+    parser.add_argument('--follow', action='store_true',
+                        help='持续跟踪不断增长的日志文件，只处理新追加的完整行（隐含 --lines，Ctrl-C 结束）\n'
+                             'Keep following a growing log file and unescape only newly appended complete lines '
+                             '(implies --lines, stop with Ctrl-C)')
+    parser.add_argument('--checkpoint', metavar='FILE',
+                        help='配合 --follow，把已处理到的位置保存到 FILE，重启后接着处理；-o 输出改为追加\n'
+                             'With --follow, save the processed offset to FILE and resume from it on restart; -o appends')
+    parser.add_argument('--poll-interval', type=float, default=0.2,
+                        help='配合 --follow，没有新内容时检查文件的间隔秒数（默认 %(default)s）\n'
+                             'With --follow, seconds between checks when idle (default: %(default)s)')
+    parser.add_argument('--from-end', action='store_true',
+                        help='配合 --follow，没有检查点时从文件末尾开始（默认从头处理）\n'
+                             'With --follow and no checkpoint, start at the end of the file (default: from the start)')
+    parser.add_argument('--cache', nargs='?', const=DEFAULT_CACHE_PATH, metavar='FILE',
+                        help='按行处理时把每行的结果缓存到磁盘（sqlite），重复处理相同内容时直接取结果，'
+                             '可多个进程共用（不写 FILE 时为 %(const)s；cache-stats 子命令查看统计）\n'
+                             'In line mode, cache each line\'s result on disk (sqlite) so reruns over the same content '
+                             'skip the work; safe to share between processes (default FILE: %(const)s; '
+                             'see the cache-stats subcommand)')
+    parser.add_argument('--cache-max-bytes', type=int, default=CACHE_MAX_BYTES,
+                        help='缓存结果的总字节数上限，超过时淘汰最久没用过的条目（默认 %(default)s）\n'
+                             'Size cap of cached results in bytes, least recently used entries are evicted '
+                             '(default: %(default)s)')
+    parser.add_argument('--profile', action='store_true',
+                        help='统计每条记录和总计的轮数、每轮输入输出大小、各阶段耗时和停止原因，输出到标准错误\n'
+                             'Report passes, per-pass sizes, stage timings and stop reasons per record and in total (to stderr)')
+    parser.add_argument('--profile-format', choices=['text', 'json'], default='text',
+                        help='--profile 报告的格式（默认 %(default)s）\nFormat of the --profile report (default: %(default)s)')
+    parser.add_argument('--profile-output',
+                        help='--profile 报告写入的文件（默认标准错误）\nFile to write the --profile report to (default: stderr)')
+    parser.add_argument('--profile-top', type=int, default=10,
+                        help='报告中列出最慢的记录条数，0 表示全部（默认 %(default)s）\n'
+                             'Number of slowest records to list, 0 for all (default: %(default)s)')
+    parser.add_argument('--cprofile', metavar='FILE',
+                        help='用 cProfile 运行并把统计写入 FILE（可用 python -m pstats FILE 查看）\n'
+                             'Run under cProfile and dump the stats to FILE (view with python -m pstats FILE)')
+    parser.add_argument('--tracemalloc', action='store_true',
+                        help='配合 --profile，记录内存峰值和分配最多的代码位置\n'
+                             'With --profile, record peak memory and the top allocation sites')
     args = parser.parse_args()
 
     # 兼容 -i 和位置参数
@@ -71,17 +782,119 @@ if __name__ == "__main__":
     if not input_file:
         parser.error("必须指定输入文件名（位置参数或 -i）\nInput file name is required (positional or -i)")
 
-    with open(input_file, "r", encoding="utf-8") as f:
-        content = f.read().strip()
-    if args.number is not None:
-        result = multi_unescape(content, args.number)
-    else:
-        result = multi_unescape(content, None)
+    if args.jobs < 1:
+        parser.error("--jobs 必须大于等于1\n--jobs must be at least 1")
+    if args.mmap and input_file == '-':
+        parser.error("--mmap 不能用于标准输入\n--mmap cannot be used with stdin")
+    if args.tracemalloc and not args.profile:
+        parser.error("--tracemalloc 需要配合 --profile\n--tracemalloc requires --profile")
+    if args.follow:
+        if input_file == '-':
+            parser.error("--follow 不能用于标准输入\n--follow cannot be used with stdin")
+        if args.profile or args.cprofile:
+            parser.error("--follow 不能和 --profile/--cprofile 一起使用\n--follow cannot be combined with --profile/--cprofile")
+    cache = None
+    if args.cache:
+        if not (args.lines or args.jobs > 1 or args.follow):
+            parser.error("--cache 需要按行处理（--lines/--jobs/--follow）\n--cache requires line mode (--lines/--jobs/--follow)")
+        if args.profile:
+            parser.error("--cache 不能和 --profile 一起使用\n--cache cannot be combined with --profile")
+        try:
+            cache = DiskCache(args.cache, args.cache_max_bytes)
+        except (OSError, sqlite3.Error) as e:
+            parser.error(f"无法打开缓存 {args.cache}: {e}\nCannot open cache {args.cache}: {e}")
+
+    if args.follow:
+        options = dict(times=args.number, engine=args.engine, convert_unicode=args.zh, extract=args.extract,
+                       unicode_range=args.zh_range)
+        try:
+            follow(input_file, args.output, options, args.checkpoint, args.poll_interval, args.from_end, cache)
+        finally:
+            if cache is not None:
+                cache.close()
+        return
 
-    if args.zh:
-        result = unicode_to_chinese_only(result)
+    profile = Profile(args.profile_top) if args.profile else None
+    if profile is not None and args.jobs > 1:
+        print("--profile 在单进程中逐行统计，忽略 --jobs\n--profile runs in a single process, --jobs is ignored",
+              file=sys.stderr)
+
+    if args.tracemalloc:
+        import tracemalloc
+        tracemalloc.start()
+    profiler = None
+    if args.cprofile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        run(args, input_file, profile, cache)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(args.cprofile)
+        if cache is not None:
+            cache.close()
+
+    if profile is not None:
+        report = profile.report()
+        if args.tracemalloc:
+            report['memory'] = _memory_report(tracemalloc)
+            tracemalloc.stop()
+        if args.profile_format == 'json':
+            text = json.dumps(report, ensure_ascii=False, indent=2) + "\n"
+        else:
+            text = format_profile(report)
+        if args.profile_output:
+            with open(args.profile_output, "w", encoding="utf-8") as f:
+                f.write(text)
+        else:
+            sys.stderr.write(text)
+
+
+def _memory_report(tracemalloc, limit=10):
+    """内存峰值和分配最多的代码位置"""
+    peak = tracemalloc.get_traced_memory()[1]
+    stats = tracemalloc.take_snapshot().statistics('lineno')[:limit]
+    return {
+        'peak_bytes': peak,
+        'top': [{'where': str(stat.traceback), 'size': stat.size, 'count': stat.count} for stat in stats],
+    }
+
+
+def run(args, input_file, profile=None, cache=None):
+    """按命令行参数处理输入并写出结果，profile 不为None时记录统计，cache 只用于按行处理"""
+    if args.lines or args.jobs > 1:
+        options = dict(times=args.number, engine=args.engine, convert_unicode=args.zh, extract=args.extract,
+                       unicode_range=args.zh_range)
+        stream_lines(input_file, args.output, options, args.jobs, args.mmap, profile, cache)
+        return
+
+    trace = UnescapeTrace() if profile is not None else None
+    start = time.perf_counter()
+    if not args.extract:
+        # 整体处理走字节缓冲区流水线，峰值内存有上界
+        input_size, output_size = unescape_file(input_file, args.output, args.number, args.engine, args.zh,
+                                                args.zh_range, trace, print_diagnostic)
+        if profile is not None:
+            profile.add(1, input_size, output_size, trace, time.perf_counter() - start)
+        return
+
+    if args.mmap:
+        content = read_mmap_text(input_file)
+    else:
+        with open_input(input_file) as f:
+            content = f.read().strip()
+    result = unescape(content, args.number, args.engine, args.zh, True, args.zh_range, trace=trace).text
+    if profile is not None:
+        profile.add(1, len(content), len(result), trace, time.perf_counter() - start)
     if args.output:
         with open(args.output, "w", encoding="utf-8") as f:
-            f.write(result)
+            write_text(f, result)
     else:
-        print(result)
+        write_text(sys.stdout, result)
+        sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,100 +1,601 @@
 #!/usr/bin/env python3
 
-import sys
-import re
-import json
-from flask import Flask, render_template, request, jsonify, send_from_directory
+from flask import Flask, Response, abort, g, request, jsonify, stream_with_context
+from werkzeug.utils import safe_join
 import os
+import sys
+import gzip
+import time
+import bisect
+import codecs
+import zlib
+import hashlib
+import mimetypes
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 
-app = Flask(__name__)
+from unescape_core import (ENGINES, DEFAULT_ENGINE, UNICODE_RANGES, UnescapeBudget, UnescapeLimitExceeded,
+                           UnescapeTrace, unescape as unescape_text, unescape_lines)
 
+# 静态文件由下面的 static_files 提供，不使用 Flask 自带的静态路由
+app = Flask(__name__, static_folder=None)
 
-def is_valid_json(s):
-    """检查字符串是否为有效的JSON格式"""
-    try:
-        json.loads(s)
-        return True
-    except Exception:
-        return False
-
-
-def multi_unescape(s, times=None):
-    """多次unescape字符串，支持自动检测合法JSON"""
-    if is_valid_json(s):
-        return s
-    if times is None:
-        temp = s
-        for i in range(10):
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(BASE_DIR, 'static')
+
+# 流式模式下每次读取请求体的字节数
+STREAM_CHUNK_BYTES = 64 * 1024
+
+# 结果缓存配置，可通过环境变量调整，UNESCAPE_CACHE=0 关闭缓存
+app.config['RESULT_CACHE_ENABLED'] = os.environ.get('UNESCAPE_CACHE', '1') != '0'
+app.config['RESULT_CACHE_MAX_ENTRIES'] = int(os.environ.get('UNESCAPE_CACHE_MAX_ENTRIES', 256))
+app.config['RESULT_CACHE_MAX_BYTES'] = int(os.environ.get('UNESCAPE_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+# 批量接口：单次最多条数，未命中缓存的条目达到多少条时使用进程池，进程池大小
+app.config['BATCH_MAX_ITEMS'] = int(os.environ.get('UNESCAPE_BATCH_MAX_ITEMS', 1000))
+app.config['BATCH_PARALLEL_MIN'] = int(os.environ.get('UNESCAPE_BATCH_PARALLEL_MIN', 32))
+app.config['BATCH_WORKERS'] = int(os.environ.get('UNESCAPE_BATCH_WORKERS', os.cpu_count() or 1))
+# 单次请求的处理预算：输入大小、各轮unescape和解析累计处理量、处理时间（秒）
+app.config['MAX_INPUT_BYTES'] = int(os.environ.get('UNESCAPE_MAX_INPUT_BYTES', 50 * 1024 * 1024))
+app.config['MAX_TOTAL_BYTES'] = int(os.environ.get('UNESCAPE_MAX_TOTAL_BYTES', 500 * 1024 * 1024))
+app.config['MAX_SECONDS'] = float(os.environ.get('UNESCAPE_MAX_SECONDS', 10))
+# 主页和静态文件的浏览器缓存时间（秒），过期后凭 ETag 重新验证，内容没变时返回304
+app.config['STATIC_MAX_AGE'] = int(os.environ.get('UNESCAPE_STATIC_MAX_AGE', 7 * 24 * 3600))
+
+# 小于这个大小的静态内容不压缩
+GZIP_MIN_BYTES = 512
+# 接口响应压缩：开关、最小大小（字节）和压缩级别（1-9）
+app.config['COMPRESS_ENABLED'] = os.environ.get('UNESCAPE_COMPRESS', '1') != '0'
+app.config['COMPRESS_MIN_BYTES'] = int(os.environ.get('UNESCAPE_COMPRESS_MIN_BYTES', 1024))
+app.config['COMPRESS_LEVEL'] = int(os.environ.get('UNESCAPE_COMPRESS_LEVEL', 6))
+# 流式响应压缩时，每累计这么多输入字节强制输出一次，客户端能及时看到结果
+COMPRESS_FLUSH_BYTES = 64 * 1024
+# 会被压缩的响应类型
+COMPRESSIBLE_MIMETYPES = ('application/json', 'text/plain', 'text/html')
+# 支持的编码及 zlib 的 wbits 参数
+ENCODING_WBITS = {'gzip': 31, 'deflate': 15}
+
+
+class ResultCache:
+    """进程内的LRU结果缓存，按条目数和总字节数淘汰"""
+
+    def __init__(self, max_entries, max_bytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(text, *options):
+        """用输入文本和参数的摘要作为键，不在内存里保留原文"""
+        h = hashlib.blake2b(digest_size=20)
+        h.update(text.encode('utf-8', 'surrogatepass'))
+        h.update(repr(options).encode('utf-8'))
+        return h.digest()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        size = sys.getsizeof(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._bytes -= sys.getsizeof(old)
+            self._items[key] = value
+            self._bytes += size
+            while len(self._items) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self._bytes -= sys.getsizeof(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._items),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+
+result_cache = ResultCache(app.config['RESULT_CACHE_MAX_ENTRIES'], app.config['RESULT_CACHE_MAX_BYTES'])
+
+
+# 耗时直方图的分桶（秒）
+SECONDS_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10)
+# 大小直方图的分桶（字节）
+BYTES_BUCKETS = (100, 1000, 10 ** 4, 10 ** 5, 10 ** 6, 10 ** 7, 10 ** 8)
+
+
+class Metrics:
+    """进程内的计数器和直方图，按 Prometheus 文本格式导出
+
+    记录时只做一次分桶查找和几次加法，可以在生产环境常开。
+    """
+
+    # 指标名: (类型, 说明, 分桶)
+    DEFINITIONS = {
+        'unescape_requests_total': ('counter', '按接口和状态码统计的请求数', None),
+        'unescape_request_seconds': ('histogram', '整个请求的处理耗时', SECONDS_BUCKETS),
+        'unescape_stage_seconds': ('histogram', '各阶段的耗时（validate/unescape/unicode/extract_scan/serialize）',
+                                   SECONDS_BUCKETS),
+        'unescape_pass_seconds': ('histogram', '第N轮unescape的耗时', SECONDS_BUCKETS),
+        'unescape_passes': ('histogram', '每条输入unescape的轮数', tuple(range(11))),
+        'unescape_autodetect_total': ('counter', '自动检测层数的结果', None),
+        'unescape_stop_total': ('counter', '停止unescape的原因', None),
+        'unescape_input_bytes': ('histogram', '输入大小（字符数）', BYTES_BUCKETS),
+        'unescape_output_bytes': ('histogram', '输出大小（字符数）', BYTES_BUCKETS),
+        'unescape_limit_exceeded_total': ('counter', '超出处理预算的次数', None),
+    }
+
+    def __init__(self):
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(labels.items()))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(labels.items()))
+        buckets = self.DEFINITIONS[name][2]
+        i = bisect.bisect_left(buckets, value)
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                # 各桶的计数（最后一个是 +Inf）、总和、次数
+                hist = self._histograms[key] = [[0] * (len(buckets) + 1), 0.0, 0]
+            hist[0][i] += 1
+            hist[1] += value
+            hist[2] += 1
+
+    def record_trace(self, trace):
+        """记录一次处理的各阶段耗时、轮数和自动检测结果"""
+        for stage, seconds in trace.stages.items():
+            self.observe('unescape_stage_seconds', seconds, stage=stage)
+        for i, seconds in enumerate(trace.pass_seconds):
+            self.observe('unescape_pass_seconds', seconds, **{'pass': str(i + 1)})
+        self.observe('unescape_passes', trace.passes)
+        for outcome, count in trace.outcomes.items():
+            self.inc('unescape_autodetect_total', count, outcome=outcome)
+        for reason, count in trace.stops.items():
+            self.inc('unescape_stop_total', count, reason=reason)
+
+    def record_result(self, trace, input_text, result):
+        """记录一条转义的耗时和输入输出大小，result 为None表示失败"""
+        if trace is not None:
+            self.record_trace(trace)
+        self.observe('unescape_input_bytes', len(input_text))
+        if result is not None:
+            self.observe('unescape_output_bytes', len(result))
+
+    @staticmethod
+    def _labels(labels, extra=()):
+        pairs = list(labels) + list(extra)
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{k}="{v}"' for k, v in pairs) + '}'
+
+    def render(self, cache_stats=None):
+        """导出为 Prometheus 文本格式，cache_stats 为 ResultCache.stats() 的结果"""
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: (list(h[0]), h[1], h[2]) for key, h in self._histograms.items()}
+        lines = []
+        for name, (kind, help_text, buckets) in self.DEFINITIONS.items():
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            if kind == 'counter':
+                for (metric, labels), value in sorted(counters.items()):
+                    if metric == name:
+                        lines.append(f'{name}{self._labels(labels)} {value}')
+                continue
+            for (metric, labels), (counts, total, count) in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, n in zip(buckets + ('+Inf',), counts):
+                    cumulative += n
+                    lines.append(f'{name}_bucket{self._labels(labels, [("le", bound)])} {cumulative}')
+                lines.append(f'{name}_sum{self._labels(labels)} {total}')
+                lines.append(f'{name}_count{self._labels(labels)} {count}')
+        if cache_stats is not None:
+            for key, kind, help_text in (('hits', 'counter', '结果缓存命中次数'),
+                                         ('misses', 'counter', '结果缓存未命中次数'),
+                                         ('entries', 'gauge', '结果缓存条目数'),
+                                         ('bytes', 'gauge', '结果缓存占用字节数')):
+                name = f'unescape_cache_{key}_total' if kind == 'counter' else f'unescape_cache_{key}'
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} {kind}')
+                lines.append(f'{name} {cache_stats[key]}')
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
+
+
+@app.before_request
+def _start_timer():
+    g.request_start = time.perf_counter()
+
+
+@app.after_request
+def _record_request(response):
+    """记录请求耗时；流式响应只统计到开始返回为止"""
+    start = g.get('request_start')
+    if start is not None:
+        endpoint = request.endpoint or 'unknown'
+        metrics.observe('unescape_request_seconds', time.perf_counter() - start, endpoint=endpoint)
+        metrics.inc('unescape_requests_total', endpoint=endpoint, status=str(response.status_code))
+    return response
+
+
+def timed_jsonify(payload):
+    """序列化响应并记录序列化耗时"""
+    start = time.perf_counter()
+    response = jsonify(payload)
+    metrics.observe('unescape_stage_seconds', time.perf_counter() - start, stage='serialize')
+    return response
+
+
+def _etag_matches(if_none_match, etags):
+    """If-None-Match 中是否有任一 ETag 与当前内容一致（按弱比较，忽略 W/ 前缀）"""
+    for tag in if_none_match.split(','):
+        tag = tag.strip()
+        if tag == '*':
+            return True
+        if tag.startswith('W/'):
+            tag = tag[2:]
+        if tag in etags:
+            return True
+    return False
+
+
+def negotiate_encoding(accept_encoding, supported=tuple(ENCODING_WBITS)):
+    """按 Accept-Encoding 的q值从 supported 中选出编码，都不接受时返回None"""
+    weights = {}
+    for item in (accept_encoding or '').split(','):
+        coding, _, params = item.partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
             try:
-                s_new = bytes(s, "utf-8").decode("unicode_escape")
-            except Exception as e:
-                print(f"Exception occurred at unescape #{i+1}: {e}, stop converting.", file=sys.stderr)
-                break
-            if '\\x' in s_new:
-                print(f"Found \\x escape after unescape #{i+1}, stop converting.", file=sys.stderr)
-                break
-            s = s_new
-            if is_valid_json(s):
-                return s
-        return temp
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[coding] = q
+    best, best_q = None, 0.0
+    for coding in supported:
+        q = weights.get(coding, weights.get('*', 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def compress_body(body, encoding, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, ENCODING_WBITS[encoding])
+    return compressor.compress(body) + compressor.flush()
+
+
+def compress_stream(chunks, encoding, level):
+    """增量压缩流式响应，每 COMPRESS_FLUSH_BYTES 输入字节同步刷新一次"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, ENCODING_WBITS[encoding])
+    pending = 0
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        data = compressor.compress(chunk)
+        pending += len(chunk)
+        if pending >= COMPRESS_FLUSH_BYTES:
+            data += compressor.flush(zlib.Z_SYNC_FLUSH)
+            pending = 0
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def _accepts_gzip(accept_encoding):
+    return negotiate_encoding(accept_encoding, ('gzip',)) == 'gzip'
+
+
+class StaticAsset:
+    """构建一次就不再变化的静态内容：原文、gzip压缩版和各自的强ETag"""
+
+    def __init__(self, body, mimetype, gzip_body=None, mtime=None):
+        self.body = body
+        self.mimetype = mimetype
+        self.mtime = mtime
+        digest = hashlib.blake2b(body, digest_size=16).hexdigest()
+        self.etag = f'"{digest}"'
+        if gzip_body is None and len(body) >= GZIP_MIN_BYTES and not mimetype.startswith(('image/', 'font/woff')):
+            # mtime=0 让同样的内容压缩出同样的字节
+            gzip_body = gzip.compress(body, 9, mtime=0)
+        if gzip_body is not None and len(gzip_body) >= len(body):
+            gzip_body = None
+        self.gzip_body = gzip_body
+        # 压缩版和原文是不同的表示，ETag 也要不同
+        self.gzip_etag = f'"{digest}-gz"'
+
+    @classmethod
+    def from_file(cls, path):
+        """读取文件，同目录下有 path.gz 时作为预压缩版本"""
+        mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        if mimetype.startswith('text/') or mimetype in ('application/javascript', 'application/json'):
+            mimetype += '; charset=utf-8'
+        with open(path, 'rb') as f:
+            body = f.read()
+        gzip_body = None
+        if os.path.isfile(path + '.gz'):
+            with open(path + '.gz', 'rb') as f:
+                gzip_body = f.read()
+        return cls(body, mimetype, gzip_body, os.path.getmtime(path))
+
+    def respond(self, if_none_match, accept_encoding, max_age):
+        """按请求头选择返回的内容，返回 (状态码, 响应体, 响应头)"""
+        use_gzip = self.gzip_body is not None and _accepts_gzip(accept_encoding or '')
+        headers = {
+            'ETag': self.gzip_etag if use_gzip else self.etag,
+            'Cache-Control': f'public, max-age={max_age}',
+            'Vary': 'Accept-Encoding',
+        }
+        if if_none_match and _etag_matches(if_none_match, (self.etag, self.gzip_etag)):
+            return 304, b'', headers
+        headers['Content-Type'] = self.mimetype
+        if use_gzip:
+            headers['Content-Encoding'] = 'gzip'
+            return 200, self.gzip_body, headers
+        return 200, self.body, headers
+
+
+class StaticAssets:
+    """按路径缓存 StaticAsset，文件修改后重新读取"""
+
+    def __init__(self):
+        self._assets = {}
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        mtime = os.path.getmtime(path)
+        asset = self._assets.get(path)
+        if asset is None or asset.mtime != mtime:
+            asset = StaticAsset.from_file(path)
+            with self._lock:
+                self._assets[path] = asset
+        return asset
+
+
+def build_index_page():
+    """渲染一次主页模板，之后每个请求直接返回同一份内容"""
+    html = app.jinja_env.get_template('index.html').render()
+    return StaticAsset(html.encode('utf-8'), 'text/html; charset=utf-8')
+
+
+index_page = build_index_page()
+static_assets = StaticAssets()
+
+
+@app.after_request
+def _compress_response(response):
+    """客户端支持时压缩较大的接口响应，流式响应逐块压缩"""
+    if (not app.config['COMPRESS_ENABLED'] or response.status_code < 200 or response.status_code in (204, 304)
+            or 'Content-Encoding' in response.headers or 'ETag' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        # 带 ETag 的静态内容自己选择压缩版本
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+    if encoding is None:
+        return response
+    level = app.config['COMPRESS_LEVEL']
+    if response.is_streamed:
+        response.response = compress_stream(response.response, encoding, level)
+        response.headers.pop('Content-Length', None)
     else:
-        for i in range(times):
-            try:
-                s_new = bytes(s, "utf-8").decode("unicode_escape")
-            except Exception as e:
-                print(f"Exception occurred at unescape #{i+1}: {e}, stop converting.", file=sys.stderr)
-                break
-            s = s_new
-        return s
+        body = response.get_data()
+        if len(body) < app.config['COMPRESS_MIN_BYTES']:
+            return response
+        response.set_data(compress_body(body, encoding, level))
+    response.headers['Content-Encoding'] = encoding
+    return response
 
 
-def unicode_to_chinese_only(s):
-    """将Unicode编码转换为中文字符"""
-    def repl(match):
-        return chr(int(match.group(1), 16))
-    return re.sub(r'\\u([0-9a-fA-F]{4})', repl, s)
+def serve_asset(asset):
+    status, body, headers = asset.respond(request.headers.get('If-None-Match'),
+                                          request.headers.get('Accept-Encoding'),
+                                          app.config['STATIC_MAX_AGE'])
+    return Response(body, status=status, headers=headers)
 
 
 @app.route('/')
 def index():
     """主页"""
-    return render_template('index.html')
+    return serve_asset(index_page)
+
+
+def parse_settings(data):
+    """取出除文本外的转义参数，参数不合法时抛出 ValueError"""
+    convert_unicode = data.get('convert_unicode', False)
+    escape_times = data.get('escape_times', None)
+    engine = data.get('engine', DEFAULT_ENGINE)
+    extract = data.get('extract', False)
+    unicode_range = data.get('unicode_range')
+    
+    if engine not in ENGINES:
+        raise ValueError(f'不支持的引擎: {engine}')
+    
+    if unicode_range is not None and unicode_range not in UNICODE_RANGES:
+        raise ValueError(f'不支持的Unicode范围: {unicode_range}')
+    
+    # 处理转义次数参数
+    if escape_times is not None:
+        if escape_times == 0:
+            escape_times = None  # 0表示不设置转义次数
+        else:
+            escape_times = int(escape_times)
+    
+    return escape_times, bool(convert_unicode), engine, bool(extract), unicode_range
+
+
+def parse_options(data):
+    """从请求数据中取出文本和转义参数，参数不合法时抛出 ValueError"""
+    input_text = data.get('text', '')
+    if not input_text.strip():
+        raise ValueError('请输入内容')
+    return (input_text,) + parse_settings(data)
+
+
+def _query_settings(args):
+    """把查询参数转换成和JSON请求一样的类型"""
+    data = {}
+    for name in ('engine', 'unicode_range'):
+        if name in args:
+            data[name] = args[name]
+    if 'escape_times' in args:
+        data['escape_times'] = int(args['escape_times'])
+    for name in ('convert_unicode', 'extract'):
+        if name in args:
+            data[name] = args[name].lower() in ('1', 'true', 'yes', 'on')
+    return parse_settings(data)
+
+
+def _iter_body_lines(stream, chunk_size=STREAM_CHUNK_BYTES):
+    """分块读取请求体并按行产出，不会把整个请求体读进内存
+
+    不合法或被截断的UTF-8替换成 U+FFFD，和跟踪日志时一样；响应头发出后再抛出解码错误
+    只会让流中途断开。
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')('replace')
+    pending = []
+    while True:
+        chunk = stream.read(chunk_size)
+        text = decoder.decode(chunk, final=not chunk)
+        lines = text.split('\n')
+        if len(lines) > 1:
+            # 跨块的行先攒着，遇到换行再拼起来
+            lines[0] = ''.join(pending) + lines[0]
+            pending = []
+            yield from lines[:-1]
+        if lines[-1]:
+            pending.append(lines[-1])
+        if not chunk:
+            break
+    if pending:
+        yield ''.join(pending)
+
+
+def budget_limits(max_seconds=None):
+    """按配置得出处理预算的上限 (输入大小, 处理总量, 秒数)，max_seconds 可进一步收紧时间上限
+
+    可以传到子进程里，由 run_unescape_safe 在开始处理时再创建预算。
+    """
+    seconds = app.config['MAX_SECONDS']
+    if max_seconds is not None:
+        seconds = max_seconds if seconds is None else min(seconds, max_seconds)
+    return app.config['MAX_INPUT_BYTES'], app.config['MAX_TOTAL_BYTES'], seconds
+
+
+def make_budget(max_seconds=None, cancel_event=None):
+    """按配置创建一次请求的处理预算，max_seconds 可进一步收紧时间上限，cancel_event 置位后停止处理"""
+    return UnescapeBudget(*budget_limits(max_seconds), cancel_event)
+
+
+def limit_error(e):
+    """超出预算时的错误信息和状态码：输入过大413，处理量或时间超限422"""
+    status = 413 if e.limit == 'input_bytes' else 422
+    return {'error': str(e), 'diagnostics': e.diagnostics()}, status
+
+
+def unescape_stream():
+    """原始文本流式模式：逐块读取请求体，逐行转义后直接流式返回，不做JSON包装"""
+    try:
+        escape_times, convert_unicode, engine, extract, unicode_range = _query_settings(request.args)
+    except Exception as e:
+        return Response(f'{e}\n', status=400, mimetype='text/plain')
+    
+    def generate():
+        trace = UnescapeTrace()
+        try:
+            # 每行单独计算预算：长时间的正常上传不会因为总处理量和总时间被截断
+            for line in _iter_body_lines(request.stream):
+                yield next(unescape_lines([line], escape_times, engine, convert_unicode, extract, unicode_range,
+                                          make_budget(), trace)) + '\n'
+        except UnescapeLimitExceeded as e:
+            metrics.inc('unescape_limit_exceeded_total', limit=e.limit)
+            # 响应头已经发出，只能在流的末尾给出错误
+            yield f'[ERROR] {e} {e.diagnostics()}\n'
+        finally:
+            metrics.record_trace(trace)
+    
+    return Response(stream_with_context(generate()), mimetype='text/plain')
+
+
+def run_unescape(input_text, escape_times, convert_unicode, engine, extract, unicode_range, budget=None,
+                 trace=None):
+    """执行转义，/unescape 和 /unescape/batch 共用（也会在子进程中调用）"""
+    return unescape_text(input_text, escape_times, engine, convert_unicode, extract, unicode_range, budget, trace).text
+
+
+def cache_key(options):
+    """parse_options 结果对应的缓存键"""
+    return ResultCache.make_key(*options)
 
 
 @app.route('/unescape', methods=['POST'])
 def unescape():
     """处理转义请求"""
+    if request.mimetype == 'text/plain':
+        return unescape_stream()
     try:
-        data = request.get_json()
-        input_text = data.get('text', '')
-        convert_unicode = data.get('convert_unicode', False)
-        escape_times = data.get('escape_times', None)
-        
-        if not input_text.strip():
-            return jsonify({
-                'success': False,
-                'error': '请输入内容'
-            })
-        
-        # 处理转义次数参数
-        if escape_times is not None:
-            if escape_times == 0:
-                escape_times = None  # 0表示不设置转义次数
-            else:
-                escape_times = int(escape_times)
-        
-        # 执行转义
-        result = multi_unescape(input_text, escape_times)
-        
-        # 如果需要转换为中文
-        if convert_unicode:
-            result = unicode_to_chinese_only(result)
-        
-        return jsonify({
+        options = parse_options(request.get_json())
+        
+        use_cache = app.config['RESULT_CACHE_ENABLED']
+        if use_cache:
+            key = cache_key(options)
+            result = result_cache.get(key)
+            if result is not None:
+                return timed_jsonify({
+                    'success': True,
+                    'result': result
+                })
+        
+        trace = UnescapeTrace()
+        result = run_unescape(*options, budget=make_budget(), trace=trace)
+        metrics.record_result(trace, options[0], result)
+        
+        if use_cache:
+            result_cache.put(key, result)
+        
+        return timed_jsonify({
             'success': True,
             'result': result
         })
         
+    except UnescapeLimitExceeded as e:
+        metrics.inc('unescape_limit_exceeded_total', limit=e.limit)
+        error, status = limit_error(e)
+        return jsonify({'success': False, **error}), status
     except Exception as e:
         return jsonify({
             'success': False,
@@ -102,546 +603,123 @@ def unescape():
         })
 
 
-@app.route('/static/<path:filename>')
-def static_files(filename):
-    """提供静态文件服务"""
-    return send_from_directory('content', filename)
+_batch_pool = None
+_batch_pool_lock = threading.Lock()
 
 
-if __name__ == '__main__':
-    # 创建templates目录和HTML文件
-    if not os.path.exists('templates'):
-        os.makedirs('templates')
-    
-    # 创建HTML模板
-    html_content = '''<!DOCTYPE html>
-<html lang="zh-CN">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>JSON转义工具</title>
-    <style>
-        * {
-            margin: 0;
-            padding: 0;
-            box-sizing: border-box;
-        }
-        
-        body {
-            font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, 'Helvetica Neue', Arial, sans-serif;
-            background-color: #f5f5f5;
-            padding: 20px;
-        }
-        
-        .container {
-            max-width: 1000px;
-            margin: 0 auto;
-            background: white;
-            border-radius: 10px;
-            box-shadow: 0 2px 10px rgba(0,0,0,0.1);
-            overflow: hidden;
-        }
-        
-        .header {
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            color: white;
-            padding: 30px;
-            text-align: center;
-        }
-        
-        .header h1 {
-            font-size: 2.5em;
-            margin-bottom: 10px;
-        }
-        
-        .header p {
-            font-size: 1.1em;
-            opacity: 0.9;
-        }
-        
-        .content {
-            padding: 30px;
-        }
-        
-        .section {
-            margin-bottom: 25px;
-        }
-        
-        .section h3 {
-            color: #333;
-            margin-bottom: 10px;
-            font-size: 1.2em;
-        }
-        
-        textarea {
-            width: 100%;
-            min-height: 200px;
-            padding: 15px;
-            border: 2px solid #e1e5e9;
-            border-radius: 8px;
-            font-family: 'Consolas', 'Monaco', 'Courier New', monospace;
-            font-size: 14px;
-            resize: vertical;
-            transition: border-color 0.3s ease;
-        }
-        
-        textarea:focus {
-            outline: none;
-            border-color: #667eea;
-            box-shadow: 0 0 0 3px rgba(102, 126, 234, 0.1);
-        }
-        
-        .controls {
-            display: flex;
-            justify-content: space-between;
-            align-items: center;
-            margin-bottom: 25px;
-            flex-wrap: wrap;
-            gap: 15px;
-        }
-        
-        .checkbox-group {
-            display: flex;
-            align-items: center;
-            gap: 10px;
-        }
-        
-        .checkbox-group input[type="checkbox"] {
-            width: 18px;
-            height: 18px;
-            accent-color: #667eea;
-        }
-        
-        .checkbox-group label {
-            color: #555;
-            font-weight: 500;
-            cursor: pointer;
-        }
-        
-        .button-group {
-            display: flex;
-            gap: 10px;
-            flex-wrap: wrap;
-        }
-        
-        button {
-            padding: 12px 24px;
-            border: none;
-            border-radius: 8px;
-            font-size: 16px;
-            font-weight: 600;
-            cursor: pointer;
-            transition: all 0.3s ease;
-            display: flex;
-            align-items: center;
-            gap: 8px;
-        }
-        
-        .btn-primary {
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            color: white;
-        }
-        
-        .btn-primary:hover {
-            transform: translateY(-2px);
-            box-shadow: 0 4px 15px rgba(102, 126, 234, 0.3);
-        }
-        
-        .btn-secondary {
-            background: #f8f9fa;
-            color: #495057;
-            border: 2px solid #e9ecef;
-        }
-        
-        .btn-secondary:hover {
-            background: #e9ecef;
-            transform: translateY(-1px);
-        }
-        
-        .btn-success {
-            background: #28a745;
-            color: white;
-        }
-        
-        .btn-success:hover {
-            background: #218838;
-            transform: translateY(-2px);
-            box-shadow: 0 4px 15px rgba(40, 167, 69, 0.3);
-        }
-        
-        .status {
-            padding: 15px;
-            border-radius: 8px;
-            margin-top: 20px;
-            display: none;
-            font-weight: 500;
-        }
-        
-        .status.success {
-            background: #d4edda;
-            color: #155724;
-            border: 1px solid #c3e6cb;
-        }
-        
-        .status.error {
-            background: #f8d7da;
-            color: #721c24;
-            border: 1px solid #f5c6cb;
-        }
-        
-        .loading {
-            display: none;
-            text-align: center;
-            padding: 20px;
-        }
-        
-        .spinner {
-            border: 3px solid #f3f3f3;
-            border-top: 3px solid #667eea;
-            border-radius: 50%;
-            width: 30px;
-            height: 30px;
-            animation: spin 1s linear infinite;
-            margin: 0 auto 10px;
-        }
-        
-        @keyframes spin {
-            0% { transform: rotate(0deg); }
-            100% { transform: rotate(360deg); }
-        }
-        
-        .example {
-            background: #f8f9fa;
-            padding: 15px;
-            border-radius: 8px;
-            border-left: 4px solid #667eea;
-            margin-bottom: 20px;
-        }
-        
-        .example h4 {
-            color: #495057;
-            margin-bottom: 8px;
-        }
-        
-        .example code {
-            background: #e9ecef;
-            padding: 2px 6px;
-            border-radius: 3px;
-            font-family: 'Consolas', 'Monaco', 'Courier New', monospace;
-            font-size: 13px;
-        }
-        
-        @media (max-width: 768px) {
-            .container {
-                margin: 10px;
-                border-radius: 8px;
-            }
-            
-            .header {
-                padding: 20px;
-            }
-            
-            .header h1 {
-                font-size: 2em;
-            }
-            
-            .content {
-                padding: 20px;
-            }
-            
-            .controls {
-                flex-direction: column;
-                align-items: stretch;
-            }
-            
-            .button-group {
-                justify-content: center;
-            }
-            
-            textarea {
-                min-height: 150px;
-            }
-        }
-    </style>
-</head>
-<body>
-    <div class="container">
-        <div class="header">
-            <div style="display: flex; justify-content: space-between; align-items: center;">
-                <div>
-                    <h1 id="pageTitle">JSON转义工具</h1>
-                    <p id="pageSubtitle">智能JSON字符串转义与Unicode转换工具</p>
-                </div>
-                <div>
-                    <button id="langZh" onclick="switchLanguage('zh')" style="margin-right: 10px; padding: 8px 16px; background: rgba(255,255,255,0.2); color: white; border: 1px solid rgba(255,255,255,0.3); border-radius: 5px; cursor: pointer; font-weight: bold;">中  文</button>
-                    <button id="langEn" onclick="switchLanguage('en')" style="padding: 8px 16px; background: rgba(255,255,255,0.2); color: white; border: 1px solid rgba(255,255,255,0.3); border-radius: 5px; cursor: pointer;">English</button>
-                </div>
-            </div>
-        </div>
-        
-        <div class="content">
-            <div class="example">
-                <h4 id="exampleTitle">使用示例：</h4>
-                <div id="exampleInput">
-                    <img src="/content/image.png" alt="示例输入" style="max-width: 100%; height: auto; border: 1px solid #ddd; border-radius: 5px;">
-                </div>
-                <p id="exampleOutput">输出：<code>{"name": "张三", "age": 25, "city": "北京"}</code></p>
-            </div>
-            
-            <div class="section">
-                <h3 id="inputTitle">输入内容：</h3>
-                <textarea id="inputText" placeholder="请输入需要转义的JSON字符串..."></textarea>
-            </div>
-            
-            <div class="controls">
-                <div class="checkbox-group">
-                    <input type="checkbox" id="convertUnicode" checked>
-                    <label for="convertUnicode" id="convertLabel">转换为中文</label>
-                </div>
-                
-                <div class="button-group">
-                    <button class="btn-primary" onclick="unescapeText()">
-                        <span>🔄</span>
-                        <span id="btnConvert">开始转义</span>
-                    </button>
-                    <button class="btn-secondary" onclick="clearAll()">
-                        <span>🗑️</span>
-                        <span id="btnClear">清空</span>
-                    </button>
-                    <button class="btn-success" onclick="copyResult()">
-                        <span>📋</span>
-                        <span id="btnCopy">复制结果</span>
-                    </button>
-                </div>
-            </div>
-            
-            <div class="loading" id="loading">
-                <div class="spinner"></div>
-                <p id="loadingText">正在处理中...</p>
-            </div>
-            
-            <div class="status" id="status"></div>
-            
-            <div class="section">
-                <h3 id="outputTitle">输出结果：</h3>
-                <textarea id="outputText" placeholder="转义后的结果将显示在这里..." readonly></textarea>
-            </div>
-        </div>
-    </div>
-
-    <script>
-        // 语言翻译对象
-        const translations = {
-            zh: {
-                pageTitle: 'JSON转义工具',
-                pageSubtitle: '智能JSON字符串转义与Unicode转换工具',
-                exampleTitle: '使用示例：',
-                exampleInput: '输入: <code>{\\\\"name\\\\": \\\\"\\\\\\\\u5f20\\\\\\\\u4e09", \\\\"age\\\\": 25, \\\\"city\\\\": \\\\"\\\\\\\\u5317\\\\\\\\u4eac\\\\"}</code><br><small>Note: \\\\u represents Unicode escape sequence</small>',
-                exampleOutput: '输出：<code>{"name": "张三", "age": 25, "city": "北京"}</code>',
-                inputTitle: '输入内容：',
-                inputPlaceholder: '请输入需要转义的JSON字符串...',
-                convertLabel: '转换Unicode编码',
-                btnConvert: '开始转义',
-                btnClear: '清空',
-                btnCopy: '复制结果',
-                loadingText: '正在处理中...',
-                outputTitle: '输出结果：',
-                outputPlaceholder: '转义后的结果将显示在这里...',
-                statusNoContent: '请输入内容',
-                statusCopySuccess: '复制成功！',
-                statusCopyError: '复制失败，请手动复制',
-                statusUnescapeSuccess: '转义成功！',
-                statusUnescapeError: '转义失败：',
-                statusNetworkError: '网络错误：',
-                statusInputRequired: '请输入内容！'
-            },
-            en: {
-                pageTitle: 'JSON Unescape Tool',
-                pageSubtitle: 'Smart JSON String Unescape and Unicode Conversion Tool',
-                exampleTitle: 'Usage Example:',
-                exampleInput: 'Input: <code>{\\\\"name\\\\": \\\\"\\\\\\\\u5f20\\\\\\\\u4e09", \\\\"age\\\\": 25, \\\\"city\\\\": \\\\"\\\\\\\\u5317\\\\\\\\u4eac\\\\"}</code><br><small>Note: \\\\u represents Unicode escape sequence</small>',
-                exampleOutput: 'Output: <code>{"name": "张三", "age": 25, "city": "北京"}</code>',
-                inputTitle: 'Input Content:',
-                inputPlaceholder: 'Please enter JSON string to unescape...',
-                convertLabel: 'Convert Unicode Encoding',
-                btnConvert: 'Start Unescape',
-                btnClear: 'Clear',
-                btnCopy: 'Copy Result',
-                loadingText: 'Processing...',
-                outputTitle: 'Output Result:',
-                outputPlaceholder: 'Unescaped result will be displayed here...',
-                statusNoContent: 'Please enter content',
-                statusCopySuccess: 'Copy successful!',
-                statusCopyError: 'Copy failed, please copy manually',
-                statusUnescapeSuccess: 'Unescape successful!',
-                statusUnescapeError: 'Unescape failed: ',
-                statusNetworkError: 'Network error: ',
-                statusInputRequired: 'Please enter content!'
-            }
-        };
-        
-        // 当前语言
-        let currentLang = 'zh';
-        
-        // 切换语言函数
-        function switchLanguage(lang) {
-            currentLang = lang;
-            const t = translations[lang];
-            
-            // 更新页面标题和副标题
-            document.getElementById('pageTitle').textContent = t.pageTitle;
-            document.getElementById('pageSubtitle').textContent = t.pageSubtitle;
-            
-            // 更新示例部分
-            document.getElementById('exampleTitle').textContent = t.exampleTitle;
-            document.getElementById('exampleInput').innerHTML = t.exampleInput;
-            document.getElementById('exampleOutput').innerHTML = t.exampleOutput;
-            
-            // 更新输入输出部分
-            document.getElementById('inputTitle').textContent = t.inputTitle;
-            document.getElementById('inputText').placeholder = t.inputPlaceholder;
-            document.getElementById('convertLabel').textContent = t.convertLabel;
-            document.getElementById('btnConvert').textContent = t.btnConvert;
-            document.getElementById('btnClear').textContent = t.btnClear;
-            document.getElementById('btnCopy').textContent = t.btnCopy;
-            document.getElementById('loadingText').textContent = t.loadingText;
-            document.getElementById('outputTitle').textContent = t.outputTitle;
-            document.getElementById('outputText').placeholder = t.outputPlaceholder;
-            
-            // 更新语言按钮样式
-            document.getElementById('langZh').style.fontWeight = lang === 'zh' ? 'bold' : 'normal';
-            document.getElementById('langEn').style.fontWeight = lang === 'en' ? 'bold' : 'normal';
-        }
-        
-        // 页面加载完成后初始化
-        document.addEventListener('DOMContentLoaded', function() {
-            switchLanguage('zh');
-        });
-        async function unescapeText() {
-            const inputText = document.getElementById('inputText').value.trim();
-            const convertUnicode = document.getElementById('convertUnicode').checked;
-            const outputText = document.getElementById('outputText');
-            const status = document.getElementById('status');
-            const loading = document.getElementById('loading');
-            
-            if (!inputText) {
-                showStatus(translations[currentLang].statusInputRequired, 'error');
-                return;
-            }
-            
-            // 显示加载状态
-            loading.style.display = 'block';
-            status.style.display = 'none';
-            
-            try {
-                const response = await fetch('/unescape', {
-                    method: 'POST',
-                    headers: {
-                        'Content-Type': 'application/json',
-                    },
-                    body: JSON.stringify({
-                        text: inputText,
-                        convert_unicode: convertUnicode
-                    })
-                });
-                
-                const data = await response.json();
-                
-                loading.style.display = 'none';
-                
-                if (data.success) {
-                    outputText.value = data.result;
-                    showStatus(translations[currentLang].statusUnescapeSuccess, 'success');
-                } else {
-                    showStatus(translations[currentLang].statusUnescapeError + data.error, 'error');
-                }
-            } catch (error) {
-                loading.style.display = 'none';
-                showStatus(translations[currentLang].statusNetworkError + error.message, 'error');
-            }
-        }
-        
-        function clearAll() {
-            document.getElementById('inputText').value = '';
-            document.getElementById('outputText').value = '';
-            document.getElementById('status').style.display = 'none';
-        }
-        
-        function copyResult() {
-            const outputText = document.getElementById('outputText').value;
-            if (!outputText) {
-                showStatus(translations[currentLang].statusNoContent, 'error');
-                return;
-            }
-            
-            // 使用现代剪贴板API
-            if (navigator.clipboard && window.isSecureContext) {
-                navigator.clipboard.writeText(outputText).then(function() {
-                    showStatus(translations[currentLang].statusCopySuccess, 'success');
-                }).catch(function(err) {
-                    console.error('复制失败:', err);
-                    fallbackCopy(outputText);
-                });
-            } else {
-                // 降级方案
-                fallbackCopy(outputText);
-            }
-        }
-        
-        // 降级复制方案
-        function fallbackCopy(text) {
-            const textArea = document.createElement('textarea');
-            textArea.value = text;
-            textArea.style.position = 'fixed';
-            textArea.style.left = '-999999px';
-            textArea.style.top = '-999999px';
-            document.body.appendChild(textArea);
-            textArea.focus();
-            textArea.select();
-            
-            try {
-                document.execCommand('copy');
-                showStatus(translations[currentLang].statusCopySuccess, 'success');
-            } catch (err) {
-                console.error('复制失败:', err);
-                showStatus(translations[currentLang].statusCopyError, 'error');
-            } finally {
-                document.body.removeChild(textArea);
-            }
-        }
-        function showStatus(message, type) {
-            const status = document.getElementById('status');
-            status.textContent = message;
-            status.className = 'status ' + type;
-            status.style.display = 'block';
-            
-            // 3秒后自动隐藏状态信息
-            setTimeout(() => {
-                status.style.display = 'none';
-            }, 3000);
-        }
-        
-        // 支持Ctrl+Enter快捷键
-        document.getElementById('inputText').addEventListener('keydown', function(e) {
-            if (e.ctrlKey && e.key === 'Enter') {
-                e.preventDefault();
-                unescapeText();
-            }
-        });
-    </script>
-</body>
-</html>'''
+def _get_batch_pool():
+    """按需创建批量接口使用的进程池"""
+    global _batch_pool
+    with _batch_pool_lock:
+        if _batch_pool is None:
+            _batch_pool = ProcessPoolExecutor(max_workers=app.config['BATCH_WORKERS'])
+        return _batch_pool
+
+
+def run_unescape_safe(options, limits=None, cancel_event=None):
+    """子进程中执行单条转义，返回 (True, 结果, trace) 或 (False, 错误信息dict, trace)
+
+    limits 为 budget_limits 的结果，预算在这一条开始处理时才创建，排队等待的时间不计入时限。
+    trace 随结果一起返回，在子进程中执行时耗时才能带回主进程记录。
+    """
+    budget = None if limits is None else UnescapeBudget(*limits, cancel_event)
+    trace = UnescapeTrace()
+    try:
+        return True, run_unescape(*options, budget=budget, trace=trace), trace
+    except UnescapeLimitExceeded as e:
+        return False, limit_error(e)[0], trace
+    except Exception as e:
+        return False, {'error': str(e)}, trace
+
+
+def record_outcome(options, ok, value, trace):
+    """记录 run_unescape_safe 一条结果的指标"""
+    metrics.record_result(trace, options[0], value if ok else None)
+    if not ok and 'diagnostics' in value:
+        metrics.inc('unescape_limit_exceeded_total', limit=value['diagnostics']['limit'])
+
+
+@app.route('/unescape/batch', methods=['POST'])
+def unescape_batch():
+    """批量处理转义请求，每条单独设置参数，按原顺序返回结果"""
+    try:
+        items = request.get_json().get('items')
+        if not isinstance(items, list):
+            raise ValueError('items 必须是数组')
+        if len(items) > app.config['BATCH_MAX_ITEMS']:
+            raise ValueError(f'单次最多 {app.config["BATCH_MAX_ITEMS"]} 条')
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        })
     
-    # 写入HTML文件
-    with open('templates/index.html', 'w', encoding='utf-8') as f:
-        f.write(html_content)
+    use_cache = app.config['RESULT_CACHE_ENABLED']
+    results = [None] * len(items)
+    pending = []
+    for i, item in enumerate(items):
+        try:
+            options = parse_options(item)
+        except Exception as e:
+            results[i] = {'success': False, 'error': str(e)}
+            continue
+        key = cache_key(options) if use_cache else None
+        result = result_cache.get(key) if use_cache else None
+        if result is not None:
+            results[i] = {'success': True, 'result': result}
+        else:
+            pending.append((i, key, options))
     
-    print("Web界面已创建完成！")
-    print("正在启动Flask服务器...")
+    # 未命中缓存的条目较多时交给进程池并行处理，每条开始处理时单独创建预算
+    options_list = [options for _, _, options in pending]
+    limits = [budget_limits()] * len(pending)
+    if len(pending) >= app.config['BATCH_PARALLEL_MIN']:
+        outcomes = _get_batch_pool().map(run_unescape_safe, options_list, limits)
+    else:
+        outcomes = map(run_unescape_safe, options_list, limits)
+    for (i, key, options), (ok, value, trace) in zip(pending, outcomes):
+        record_outcome(options, ok, value, trace)
+        if ok:
+            if use_cache:
+                result_cache.put(key, value)
+            results[i] = {'success': True, 'result': value}
+        else:
+            results[i] = {'success': False, **value}
     
+    return timed_jsonify({
+        'success': True,
+        'results': results
+    })
+
+
+@app.route('/cache/stats')
+def cache_stats():
+    """结果缓存的命中统计"""
+    stats = result_cache.stats()
+    stats['enabled'] = app.config['RESULT_CACHE_ENABLED']
+    return jsonify(stats)
+
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus 格式的请求、各阶段耗时和缓存指标"""
+    cache = result_cache.stats() if app.config['RESULT_CACHE_ENABLED'] else None
+    return Response(metrics.render(cache), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/static/<path:filename>')
+def static_files(filename):
+    """提供静态文件服务，static 目录下有 .gz 文件时直接使用预压缩的版本"""
+    path = safe_join(STATIC_DIR, filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+    return serve_asset(static_assets.get(path))
+
+
+def main():
     # 启动Flask应用
     app.run(debug=True, host='0.0.0.0', port=8080)
 
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()